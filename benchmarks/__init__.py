@@ -0,0 +1,6 @@
+"""
+Benchmarks measuring how the dashboard scales with the size of the salaries data.
+
+    python -m benchmarks.run [--sizes 10000 100000 1000000] [--out results.json]
+    python -m benchmarks.compare baseline.json results.json
+"""
@@ -0,0 +1,83 @@
+"""
+Module comparing two result files written by `benchmarks.run`, e.g. of two commits.
+
+A step is reported as a regression when its median duration grew by more than the threshold
+(25 % by default) and by more than the noise floor (1 ms by default). The exit status is 1 if
+there is any regression, so the comparison can be used in CI.
+
+    python -m benchmarks.compare BASELINE CURRENT [--threshold 0.25] [--min-difference 1]
+"""
+
+import argparse
+import json
+import sys
+
+
+def _load_results(path: str):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.25, min_difference: float = 1.0):
+    """Compares the median durations of the steps measured in both results.
+
+    Args:
+        baseline (dict): The baseline results.
+        current (dict): The current results.
+        threshold (float): The relative growth of the duration considered a regression.
+        min_difference (float): The growth in milliseconds under which a difference is considered noise.
+
+    Returns:
+        list of dict: The `size`, the `step`, the `baseline` and the `current` median duration,
+                      their `ratio` and whether it is a `regression`, for every step measured in both.
+    """
+    rows = []
+
+    for size, steps in current["results"].items():
+        for step, durations in steps.items():
+            baseline_durations = baseline["results"].get(size, {}).get(step)
+            if baseline_durations is None:
+                continue
+
+            old, new = baseline_durations["median"], durations["median"]
+            ratio = new / old if old else float("inf")
+            rows.append({
+                "size": size,
+                "step": step,
+                "baseline": old,
+                "current": new,
+                "ratio": ratio,
+                "regression": ratio > 1 + threshold and new - old > min_difference,
+            })
+
+    return rows
+
+
+def main():
+    """Prints the comparison of two result files and fails if there is a regression."""
+    parser = argparse.ArgumentParser(description="Compares two benchmark result files.")
+    parser.add_argument("baseline", help="the JSON file with the baseline results")
+    parser.add_argument("current", help="the JSON file with the current results")
+    parser.add_argument("--threshold", type=float, default=0.25, help="the relative growth considered a regression (default: %(default)s)")
+    parser.add_argument("--min-difference", type=float, default=1.0, help="the growth in ms considered noise (default: %(default)s)")
+    args = parser.parse_args()
+
+    baseline, current = _load_results(args.baseline), _load_results(args.current)
+    rows = compare(baseline, current, args.threshold, args.min_difference)
+
+    print(f"baseline {baseline.get('commit')}, current {current.get('commit')}")
+    width = max((len(row["step"]) for row in rows), default=0)
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(
+            f"{row['size']:>9}  {row['step']:<{width}}  {row['baseline']:10.1f} ms  {row['current']:10.1f} ms"
+            f"  {row['ratio']:6.2f}x{flag}"
+        )
+
+    regressions = sum(row["regression"] for row in rows)
+    print(f"{regressions} regression(s) in {len(rows)} step(s)")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
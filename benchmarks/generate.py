@@ -0,0 +1,121 @@
+"""
+Module generating synthetic salaries data with the schema of `data/salaries.csv`.
+
+The cardinalities and the skew of the columns resemble the real data: a few experience levels,
+employment types and company sizes, around 150 job titles and 80 countries with most of the rows
+in a handful of them, and salaries depending on the experience level. The data are generated and
+written in chunks, so even files with tens of millions of rows need little memory.
+
+    python -m benchmarks.generate ROWS OUT [--seed 0]
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+CHUNK_SIZE = 1_000_000
+
+WORK_YEARS = {2020: 0.02, 2021: 0.05, 2022: 0.13, 2023: 0.35, 2024: 0.45}
+EXPERIENCE_LEVELS = {"EN": 0.1, "MI": 0.25, "SE": 0.6, "EX": 0.05}
+EXPERIENCE_SALARY_FACTORS = {"EN": 0.6, "MI": 0.85, "SE": 1.1, "EX": 1.5}
+EMPLOYMENT_TYPES = {"FT": 0.97, "PT": 0.01, "CT": 0.01, "FL": 0.01}
+COMPANY_SIZES = {"S": 0.05, "M": 0.85, "L": 0.1}
+REMOTE_RATIOS = {0: 0.6, 50: 0.1, 100: 0.3}
+
+COUNTRIES = [
+    "US", "GB", "CA", "DE", "IN", "FR", "ES", "AU", "NL", "BR", "PT", "IT", "PL", "JP", "MX", "CH",
+    "IE", "AT", "SE", "NG", "KE", "ZA", "AR", "CL", "CO", "CZ", "DK", "FI", "GR", "HU", "BE", "NO",
+    "RO", "UA", "TR", "IL", "AE", "SA", "EG", "PK", "BD", "SG", "MY", "TH", "VN", "PH", "ID", "CN",
+    "HK", "KR", "TW", "NZ", "PE", "EC", "UY", "CR", "PR", "DO", "HR", "SI", "SK", "BG", "RS", "LT",
+    "LV", "EE", "LU", "MT", "CY", "IS", "GH", "UG", "TZ", "MA", "DZ", "TN", "QA", "KW", "OM", "JO",
+]
+CURRENCIES = {"US": "USD", "GB": "GBP", "CA": "CAD", "IN": "INR", "AU": "AUD", "BR": "BRL", "JP": "JPY"}
+EUR_COUNTRIES = {"DE", "FR", "ES", "NL", "PT", "IT", "IE", "AT", "FI", "GR", "BE", "SK", "SI", "LT", "LV", "EE", "LU", "MT", "CY", "HR"}
+EXCHANGE_RATES = {"USD": 1.0, "EUR": 0.92, "GBP": 0.79, "CAD": 1.36, "INR": 83.0, "AUD": 1.52, "BRL": 5.0, "JPY": 150.0}
+
+JOB_TITLES = [
+    "Data Scientist", "Data Engineer", "Data Analyst", "Machine Learning Engineer", "Research Scientist",
+    "Applied Scientist", "Analytics Engineer", "Data Architect", "Research Engineer", "ML Engineer",
+    "AI Engineer", "Business Intelligence Analyst", "Data Manager", "Data Science Manager", "Head of Data",
+] + [f"Data Specialist {i}" for i in range(135)]
+
+
+def _zipf_weights(count: int, exponent: float = 1.2):
+    weights = 1 / np.arange(1, count + 1) ** exponent
+    return weights / weights.sum()
+
+
+def _choice(rng: np.random.Generator, values: dict, size: int):
+    return rng.choice(np.array(list(values)), size, p=list(values.values()))
+
+
+def generate_chunk(rng: np.random.Generator, rows: int):
+    """Generates a chunk of synthetic salaries data.
+
+    Args:
+        rng (np.random.Generator): The random number generator.
+        rows (int): The number of rows.
+
+    Returns:
+        pd.DataFrame: The generated rows with the columns of `data/salaries.csv`.
+    """
+    experience_levels = _choice(rng, EXPERIENCE_LEVELS, rows)
+    company_locations = rng.choice(COUNTRIES, rows, p=_zipf_weights(len(COUNTRIES)))
+    # most employees live in the country of their company
+    employee_residences = np.where(
+        rng.random(rows) < 0.9, company_locations, rng.choice(COUNTRIES, rows, p=_zipf_weights(len(COUNTRIES)))
+    )
+
+    factors = pd.Series(experience_levels).map(EXPERIENCE_SALARY_FACTORS).to_numpy()
+    salaries_in_usd = (rng.lognormal(11.8, 0.45, rows) * factors).astype(np.int64) + 15000
+
+    currencies = pd.Series(employee_residences).map(CURRENCIES).to_numpy(dtype=object)
+    currencies[np.isin(employee_residences, list(EUR_COUNTRIES))] = "EUR"
+    currencies[pd.isna(currencies)] = "USD"
+    rates = pd.Series(currencies).map(EXCHANGE_RATES).to_numpy()
+
+    return pd.DataFrame({
+        "work_year": _choice(rng, WORK_YEARS, rows),
+        "experience_level": experience_levels,
+        "employment_type": _choice(rng, EMPLOYMENT_TYPES, rows),
+        "job_title": rng.choice(JOB_TITLES, rows, p=_zipf_weights(len(JOB_TITLES), 0.9)),
+        "salary": (salaries_in_usd * rates).astype(np.int64),
+        "salary_currency": currencies,
+        "salary_in_usd": salaries_in_usd,
+        "employee_residence": employee_residences,
+        "remote_ratio": _choice(rng, REMOTE_RATIOS, rows),
+        "company_location": company_locations,
+        "company_size": _choice(rng, COMPANY_SIZES, rows),
+    })
+
+
+def generate_csv(path: str, rows: int, seed: int = 0):
+    """Writes a CSV file with synthetic salaries data.
+
+    Args:
+        path (str): Path to the CSV file.
+        rows (int): The number of rows.
+        seed (int): The seed of the random number generator, the same seed gives the same file.
+    """
+    rng = np.random.default_rng(seed)
+
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for start in range(0, max(rows, 1), CHUNK_SIZE):
+            chunk = generate_chunk(rng, min(CHUNK_SIZE, rows - start))
+            chunk.to_csv(f, header=start == 0, index=False)
+
+
+def main():
+    """Generates a CSV file with synthetic salaries data."""
+    parser = argparse.ArgumentParser(description="Generates synthetic salaries data.")
+    parser.add_argument("rows", type=int, help="the number of rows")
+    parser.add_argument("out", help="path to the CSV file")
+    parser.add_argument("--seed", type=int, default=0, help="the seed of the random number generator (default: %(default)s)")
+    args = parser.parse_args()
+
+    generate_csv(args.out, args.rows, args.seed)
+
+
+if __name__ == "__main__":
+    main()
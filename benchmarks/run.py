@@ -0,0 +1,176 @@
+"""
+Module measuring the startup steps and the callbacks of the dashboard for several sizes of the data.
+
+For every size, synthetic data are generated (see `benchmarks.generate`), loaded and prepared, and
+every callback is called several times with typical inputs. The figure cache is bypassed, so the
+callbacks always compute their figures. The durations in milliseconds are written as JSON and two
+result files can be compared with `benchmarks.compare`.
+
+    python -m benchmarks.run [--sizes 10000 100000 1000000] [--repeat 5] [--out results.json]
+
+The default sizes stop at 1M rows. Generating, loading and measuring 10M rows takes minutes, so that
+size is measured only when passed explicitly, e.g. `--sizes 1000000 10000000`.
+"""
+
+import argparse
+import datetime
+import inspect
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.generate import generate_csv
+
+# 10_000_000 rows are measured only when passed with --sizes, see the module docstring
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+# the callbacks measured for every size, by the name of the page module
+CALLBACKS = {
+    "pages.salaries": [
+        ("update_graph (no filter)", "update_graph", (None, None, None, None, None)),
+        ("update_graph (cube)", "update_graph", (["SE", "MI"], ["FT"], ["M", "L"], None, None)),
+        ("update_graph (bitmap)", "update_graph", (["SE"], None, None, ["Data Scientist", "Data Engineer"], ["US", "GB"])),
+        ("update_graph (bitmap, year)", "update_graph", (["SE"], None, None, ["Data Scientist"], ["US"], [2024, 2024])),
+        ("update_graph (country)", "update_graph", (None, None, None, None, ["US"])),
+        ("update_cards (country)", "update_cards", (["US"],)),
+        ("update_cards (countries)", "update_cards", (["US", "GB", "DE"],)),
+        ("update_choropleth (years)", "update_choropleth", ([2021, 2023],)),
+        ("layout", "layout", ()),
+    ],
+    "pages.job-market": [
+        ("update_sankey_graph", "update_sankey_graph", ([2024, 2024],)),
+        ("update_sankey_graph (years)", "update_sankey_graph", ([2020, 2024],)),
+        ("update_graph", "update_graph", (["Onsite", "Remote"], [2021, 2023])),
+        ("layout", "layout", ()),
+    ],
+}
+
+
+def _measure(func, *args, repeat: int = 1):
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        durations.append((time.perf_counter() - start) * 1000)
+    return {"min": round(min(durations), 3), "median": round(statistics.median(durations), 3)}
+
+
+def _single(duration: float):
+    return {"min": round(duration * 1000, 3), "median": round(duration * 1000, 3)}
+
+
+def _get_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_size(path: str, rows: int, workdir: str, repeat: int):
+    """Measures the startup steps and the callbacks for data of one size.
+
+    Args:
+        path (str): Path to the CSV file with the data.
+        rows (int): The number of rows of the data.
+        workdir (str): The directory for the binary cache and the snapshot.
+        repeat (int): The number of calls of every callback.
+
+    Returns:
+        dict: The `min` and the `median` duration in milliseconds by the name of the step.
+    """
+    from src import dataset, profiling
+    from src.aggregates import build_grid, build_sketches
+    from src.snapshot import read_snapshot, write_snapshot
+
+    results = {}
+    shutil.rmtree(dataset.CACHE_DIR, ignore_errors=True)
+
+    start = time.perf_counter()
+    df = dataset.read_salaries_csv(path)
+    results["read csv"] = _single(time.perf_counter() - start)
+
+    fingerprint = dataset.get_fingerprint(os.stat(path))
+    dataset.load_partitions(path, fingerprint)
+    results["read cache"] = _measure(dataset.load_partitions, path, fingerprint, repeat=repeat)
+    results["build grid"] = _measure(build_grid, df, repeat=repeat)
+    results["build sketches"] = _measure(build_sketches, df, repeat=repeat)
+
+    snapshot_dir = os.path.join(workdir, f"snapshot-{rows}")
+    loaded = dataset.load_dataset(path, use_snapshot=False)
+    write_snapshot(
+        snapshot_dir, loaded.partitions, loaded.grid, loaded.sketches, loaded.version, loaded.size, loaded.tail
+    )
+    results["open snapshot"] = _measure(read_snapshot, snapshot_dir, repeat=repeat)
+    shutil.rmtree(snapshot_dir, ignore_errors=True)
+
+    profiling.timings.clear()
+    dataset.set_current(loaded)
+    results.update({step: _single(duration) for step, duration in profiling.timings.items()})
+
+    for module_name, callbacks in CALLBACKS.items():
+        module = sys.modules[module_name]
+        page = module_name.rpartition(".")[2]
+        for name, function, args in callbacks:
+            func = inspect.unwrap(getattr(module, function))
+            results[f"{page}.{name}"] = _measure(func, *args, repeat=repeat)
+
+    return results
+
+
+def main():
+    """Runs the benchmarks and writes their results as JSON."""
+    parser = argparse.ArgumentParser(description="Measures the dashboard for several sizes of the data.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="the numbers of rows (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=5, help="the number of calls of every callback (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0, help="the seed of the generated data (default: %(default)s)")
+    parser.add_argument("--workdir", default="benchmarks/data", help="the directory for the generated data (default: %(default)s)")
+    parser.add_argument("--out", default="-", help="the JSON file with the results, - for stdout (default: %(default)s)")
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    # keep the binary cache of the generated data away from the real one
+    os.environ["DASHBOARD_CACHE_DIR"] = os.path.join(args.workdir, ".cache")
+
+    start = time.perf_counter()
+    import src.main  # noqa: F401, registers the pages and their callbacks
+    from src import profiling
+
+    results = {"import": {"import src.main": _single(time.perf_counter() - start)}}
+    results["import"].update({step: _single(duration) for step, duration in profiling.timings.items()})
+
+    for rows in args.sizes:
+        path = os.path.join(args.workdir, f"salaries-{rows}-{args.seed}.csv")
+        if not os.path.exists(path):
+            print(f"Generating {rows} rows", file=sys.stderr)
+            generate_csv(path, rows, args.seed)
+
+        print(f"Measuring {rows} rows", file=sys.stderr)
+        results[str(rows)] = run_size(path, rows, args.workdir, args.repeat)
+
+    output = {
+        "commit": _get_commit(),
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "results": results,
+    }
+
+    if args.out == "-":
+        json.dump(output, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(output, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
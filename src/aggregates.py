@@ -0,0 +1,435 @@
+"""
+Module containing precomputed aggregates used by the page callbacks.
+
+The aggregates are computed once when the data is loaded, so the callbacks only look up small
+precomputed tables instead of filtering and grouping the whole dataset on every interaction.
+
+All aggregates are derived from the grid created by `build_grid`, which holds the sum and count
+of salaries for every observed combination of the low-cardinality columns. Sums and counts are
+additive, so the grid of new rows can be merged into an existing grid with `merge_grids` and the
+aggregates rebuilt from it without rescanning the data.
+
+Quantiles (e.g. the median) are not additive, so they are answered from quantile sketches created
+by `build_sketches`. A sketch counts the salaries in logarithmic buckets (like DDSketch), so any
+quantile is known with a relative error of at most `SKETCH_ACCURACY`, and sketches are merged by
+adding the counts, just like the grid.
+"""
+
+import itertools
+
+import numpy as np
+import pandas as pd
+
+GRID_DIMS = ["work_year", "experience_level", "employment_type", "company_size", "remote_ratio", "company_location"]
+
+CUBE_DIMS = ["experience_level", "employment_type", "company_size"]
+
+DIMENSION_LABELS = {
+    "company_size": {"S": "Small", "M": "Medium", "L": "Large"},
+    "remote_ratio": {0: "Onsite", 50: "Hybrid", 100: "Remote"},
+}
+
+SKETCH_DIMS = ["company_location", "work_year", "experience_level", "employment_type", "company_size"]
+
+# the relative error of the quantiles answered from the sketches
+SKETCH_ACCURACY = 0.01
+_SKETCH_GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+
+
+def build_grid(df: pd.DataFrame):
+    """Computes the sum and count of salaries for every observed combination of `GRID_DIMS`.
+
+    Args:
+        df (pd.DataFrame): The salaries data.
+
+    Returns:
+        pd.DataFrame: A data frame indexed by `GRID_DIMS` with the `sum` and `count` columns.
+    """
+    grid = df.groupby(GRID_DIMS, observed=True)["salary_in_usd"].agg(["sum", "count"]).reset_index()
+
+    # plain values in the index, so grids built from frames with different categories can be merged
+    for dim in GRID_DIMS:
+        if isinstance(grid[dim].dtype, pd.CategoricalDtype):
+            grid[dim] = grid[dim].astype(grid[dim].cat.categories.dtype)
+
+    return grid.set_index(GRID_DIMS)
+
+
+def merge_grids(*grids: pd.DataFrame):
+    """Merges grids created by `build_grid` from disjoint parts of the data.
+
+    Args:
+        *grids (pd.DataFrame): The grids to merge.
+
+    Returns:
+        pd.DataFrame: The grid of all the parts together.
+    """
+    return pd.concat(grids).groupby(level=GRID_DIMS).sum()
+
+
+def build_sketches(df: pd.DataFrame):
+    """Builds the quantile sketches of salaries for every observed combination of `SKETCH_DIMS`.
+
+    Args:
+        df (pd.DataFrame): The salaries data.
+
+    Returns:
+        pd.DataFrame: A data frame indexed by `SKETCH_DIMS` and the `bucket` of the salary with the
+                      `count` of salaries in the bucket.
+    """
+    salaries = df["salary_in_usd"].to_numpy()
+    buckets = np.ceil(np.log(np.maximum(salaries, 1)) / np.log(_SKETCH_GAMMA)).astype(np.int16)
+
+    keys = [df[dim] for dim in SKETCH_DIMS] + [pd.Series(buckets, index=df.index, name="bucket")]
+    sketches = df.groupby(keys, observed=True).size().rename("count").reset_index()
+
+    # plain values in the index like in the grid, so the sketches can be merged
+    for dim in SKETCH_DIMS:
+        if isinstance(sketches[dim].dtype, pd.CategoricalDtype):
+            sketches[dim] = sketches[dim].astype(sketches[dim].cat.categories.dtype)
+
+    return sketches.set_index(SKETCH_DIMS + ["bucket"])
+
+
+def merge_sketches(*sketches: pd.DataFrame):
+    """Merges sketches created by `build_sketches` from disjoint parts of the data.
+
+    Args:
+        *sketches (pd.DataFrame): The sketches to merge.
+
+    Returns:
+        pd.DataFrame: The sketches of all the parts together.
+    """
+    return pd.concat(sketches).groupby(level=SKETCH_DIMS + ["bucket"]).sum()
+
+
+def sketch_quantiles(sketches: pd.DataFrame, quantiles: list, **selection):
+    """Estimates the quantiles of salaries by merging the sketches of the selected cells.
+
+    Args:
+        sketches (pd.DataFrame): The sketches created by `build_sketches`.
+        quantiles (list of float): The quantiles to estimate, e.g. `[0.5, 0.9]`.
+        **selection: The selected values by a dimension of `SKETCH_DIMS`, either a single value
+                     or a list of values. Dimensions not given (or None) are not filtered.
+
+    Returns:
+        list of float or None: The estimated quantiles, None if no salary matches the selection.
+    """
+    mask = np.ones(len(sketches), dtype=bool)
+    for dim, values in selection.items():
+        values = _as_list(values)
+        if values:
+            mask &= sketches.index.get_level_values(dim).isin(values)
+
+    counts = sketches.loc[mask, "count"].groupby(level="bucket").sum().sort_index()
+    return _bucket_quantiles(counts.to_numpy(), counts.index.to_numpy(), quantiles)
+
+
+def sketch_quantiles_by(sketches: pd.DataFrame, quantiles: list, by: str):
+    """Estimates the quantiles of salaries for every value of a dimension.
+
+    Args:
+        sketches (pd.DataFrame): The sketches created by `build_sketches`.
+        quantiles (list of float): The quantiles to estimate, e.g. `[0.5, 0.9]`.
+        by (str): A dimension of `SKETCH_DIMS`.
+
+    Returns:
+        dict: A dictionary mapping every value of the dimension to the list of its estimated quantiles.
+    """
+    counts = sketches["count"].groupby(level=[by, "bucket"]).sum().sort_index()
+
+    return {
+        value: _bucket_quantiles(group.to_numpy(), group.index.get_level_values("bucket").to_numpy(), quantiles)
+        for value, group in counts.groupby(level=by)
+    }
+
+
+def _bucket_quantiles(counts: np.ndarray, buckets: np.ndarray, quantiles: list):
+    if not len(counts):
+        return [None for _ in quantiles]
+
+    cumulative = counts.cumsum()
+    positions = np.searchsorted(cumulative, [q * (cumulative[-1] - 1) for q in quantiles], side="right")
+
+    # the value in the middle of the bucket has the smallest relative error
+    return [float(2 * _SKETCH_GAMMA ** buckets[position] / (_SKETCH_GAMMA + 1)) for position in positions]
+
+
+def build_salary_cube(grid: pd.DataFrame):
+    """Builds a sum/count cube of salaries over the filter dimensions and the work year.
+
+    The cube contains every combination of the filter dimensions including the "all" roll-ups,
+    which are stored under the key `None`.
+
+    Args:
+        grid (pd.DataFrame): The grid created by `build_grid`.
+
+    Returns:
+        dict: A dictionary mapping a tuple `(experience_level, employment_type, company_size)` to
+              a data frame indexed by `work_year` with the `sum` and `count` of `salary_in_usd`.
+    """
+    base = grid.groupby(level=CUBE_DIMS + ["work_year"]).sum()
+
+    cube = {}
+    for kept in itertools.product([True, False], repeat=len(CUBE_DIMS)):
+        dims = [dim for dim, keep in zip(CUBE_DIMS, kept) if keep]
+
+        if not dims:
+            cube[(None,) * len(CUBE_DIMS)] = base.groupby(level="work_year").sum()
+            continue
+
+        rolled = base.groupby(level=dims + ["work_year"]).sum()
+        for values, group in rolled.groupby(level=dims):
+            values = iter(values if isinstance(values, tuple) else (values,))
+            key = tuple(next(values) if keep else None for keep in kept)
+            cube[key] = group.droplevel(dims)
+
+    return cube
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+def lookup_salary_per_year(cube: dict, experience_level=None, employment_type=None, company_size=None):
+    """Returns the average salary per year for the selected filter values.
+
+    Several values selected for one filter are combined by summing the corresponding cells.
+
+    Args:
+        cube (dict): The cube created by `build_salary_cube`.
+        experience_level (list of str or str or None): The selected experience levels, None or empty for all.
+        employment_type (list of str or str or None): The selected employment types, None or empty for all.
+        company_size (list of str or str or None): The selected company sizes, None or empty for all.
+
+    Returns:
+        pd.DataFrame: A data frame with the `work_year` and the average `salary_in_usd` columns.
+                      It is empty if no data matches the selection.
+    """
+    selections = [_as_list(value) or [None] for value in (experience_level, employment_type, company_size)]
+    return _average_per_year([cube[key] for key in itertools.product(*selections) if key in cube])
+
+
+def build_country_series(grid: pd.DataFrame):
+    """Splits the sum and count of salaries per year by the company location.
+
+    Args:
+        grid (pd.DataFrame): The grid created by `build_grid`.
+
+    Returns:
+        dict: A dictionary mapping a country code to a data frame indexed by `work_year` with
+              the `sum` and `count` of `salary_in_usd`.
+    """
+    per_country = grid.groupby(level=["company_location", "work_year"])[["sum", "count"]].sum()
+    return {code: group.droplevel("company_location") for code, group in per_country.groupby(level="company_location")}
+
+
+def lookup_country_salary_per_year(series: dict, company_location):
+    """Returns the average salary per year in the selected countries.
+
+    Args:
+        series (dict): The series created by `build_country_series`.
+        company_location (list of str or str): The selected country codes.
+
+    Returns:
+        pd.DataFrame: A data frame with the `work_year` and the average `salary_in_usd` columns.
+                      It is empty if no data matches the selection.
+    """
+    return _average_per_year([series[code] for code in _as_list(company_location) if code in series])
+
+
+def _average_per_year(cells: list):
+    if not cells:
+        return pd.DataFrame({"work_year": [], "salary_in_usd": []})
+
+    cell = cells[0] if len(cells) == 1 else pd.concat(cells).groupby(level="work_year").sum()
+
+    return pd.DataFrame({
+        "work_year": cell.index.to_numpy(),
+        "salary_in_usd": (cell["sum"] / cell["count"]).to_numpy(),
+    })
+
+
+def encode_table(grid: pd.DataFrame, dims: list):
+    """Encodes the sum and count of salaries per year and combination of the dimensions compactly.
+
+    Every dimension is dictionary-encoded, i.e. its distinct values are listed once and the rows
+    hold their indexes, so the table stays small when serialized as JSON, e.g. to be sent to the
+    browser.
+
+    Args:
+        grid (pd.DataFrame): The grid created by `build_grid`.
+        dims (list of str): The dimensions of the table, a subset of `GRID_DIMS`.
+
+    Returns:
+        dict: The distinct `values` and the `codes` of the rows by dimension, and the `work_year`,
+              `sum` and `count` columns of the rows.
+    """
+    table = grid.groupby(level=dims + ["work_year"])[["sum", "count"]].sum()
+
+    encoded = {"values": {}, "codes": {}}
+    for dim in dims:
+        codes, values = pd.factorize(table.index.get_level_values(dim), sort=True)
+        encoded["values"][dim] = values.tolist()
+        encoded["codes"][dim] = codes.tolist()
+
+    encoded["work_year"] = table.index.get_level_values("work_year").tolist()
+    encoded["sum"] = table["sum"].tolist()
+    encoded["count"] = table["count"].tolist()
+    return encoded
+
+
+def _labels(dimension: str, values):
+    labels = DIMENSION_LABELS.get(dimension, {})
+    return [labels.get(value, str(value)) for value in values]
+
+
+def build_flow_matrix(grid: pd.DataFrame, source: str, target: str, by: str = "work_year"):
+    """Counts the rows for every combination of the group, source and target values.
+
+    Args:
+        grid (pd.DataFrame): The grid created by `build_grid`.
+        source (str): The column used for the source nodes.
+        target (str): The column used for the target nodes.
+        by (str): The column splitting the flows into groups.
+
+    Returns:
+        dict: A dictionary with the `groups`, the `source_labels` and `target_labels` of the nodes
+              and the `matrix` of counts with the shape `(groups, sources, targets)`.
+    """
+    cells = grid.reset_index()
+    groups = cells[by].astype("category").cat
+    sources = cells[source].astype("category").cat
+    targets = cells[target].astype("category").cat
+
+    shape = (len(groups.categories), len(sources.categories), len(targets.categories))
+    codes = [groups.codes.to_numpy(np.int64), sources.codes.to_numpy(np.int64), targets.codes.to_numpy(np.int64)]
+    valid = (codes[0] >= 0) & (codes[1] >= 0) & (codes[2] >= 0)
+
+    flat_codes = np.ravel_multi_index([code[valid] for code in codes], shape)
+    counts = cells["count"].to_numpy()[valid]
+    matrix = np.bincount(flat_codes, weights=counts, minlength=int(np.prod(shape))).astype(np.int64).reshape(shape)
+
+    return {
+        "groups": groups.categories.tolist(),
+        "source_labels": _labels(source, sources.categories.tolist()),
+        "target_labels": _labels(target, targets.categories.tolist()),
+        "matrix": matrix,
+    }
+
+
+def get_sankey_links(matrix: np.ndarray, source_labels: list, target_labels: list):
+    """Converts a matrix of flows into the nodes and links of a Sankey diagram.
+
+    Only the nodes taking part in at least one flow are included.
+
+    Args:
+        matrix (np.ndarray): The counts with the shape `(sources, targets)`.
+        source_labels (list): The labels of the source nodes.
+        target_labels (list): The labels of the target nodes.
+
+    Returns:
+        dict: A dictionary with the node `labels` and the link `source`, `target` and `value` arrays.
+    """
+    source_codes, target_codes = np.nonzero(matrix)
+    used_sources = np.unique(source_codes)
+    used_targets = np.unique(target_codes)
+
+    labels = [source_labels[i] for i in used_sources] + [target_labels[i] for i in used_targets]
+
+    return {
+        "labels": labels,
+        "source": np.searchsorted(used_sources, source_codes),
+        "target": len(used_sources) + np.searchsorted(used_targets, target_codes),
+        "value": matrix[source_codes, target_codes],
+    }
+
+
+def _year_positions(years: np.ndarray, work_years):
+    start, end = work_years
+    return np.searchsorted(years, start, side="left"), np.searchsorted(years, end, side="right")
+
+
+def build_prefix_sums(grid: pd.DataFrame, dims: list):
+    """Builds cumulative sums and counts of salaries over the years for every combination of the dimensions.
+
+    The totals of any range of years are the difference of two columns of the cumulative arrays,
+    see `range_totals`, so they are computed without grouping the data again.
+
+    Args:
+        grid (pd.DataFrame): The grid created by `build_grid`.
+        dims (list of str): The dimensions of the cells, a subset of `GRID_DIMS`.
+
+    Returns:
+        dict: The `cells` (the combinations of the dimensions), the sorted `years` and the
+              cumulative `sum` and `count` arrays with the shape `(cells, years + 1)`, whose
+              first column is zero.
+    """
+    table = grid.groupby(level=dims + ["work_year"])[["sum", "count"]].sum()
+
+    cell_codes, cells = pd.factorize(table.index.droplevel("work_year"), sort=True)
+    year_codes, years = pd.factorize(table.index.get_level_values("work_year"), sort=True)
+
+    prefix = {"cells": cells, "years": np.asarray(years)}
+    for column in ("sum", "count"):
+        dense = np.zeros((len(cells), len(years) + 1), dtype=np.int64)
+        dense[cell_codes, year_codes + 1] = table[column].to_numpy()
+        prefix[column] = dense.cumsum(axis=1)
+
+    return prefix
+
+
+def range_totals(prefix: dict, work_years):
+    """Returns the sums and counts of salaries in a range of years for every cell.
+
+    Args:
+        prefix (dict): The cumulative sums created by `build_prefix_sums`.
+        work_years (list of int): The first and the last year of the range (both included).
+
+    Returns:
+        tuple: The `sum` and the `count` arrays with one value per cell.
+    """
+    start, end = _year_positions(prefix["years"], work_years)
+    return prefix["sum"][:, end] - prefix["sum"][:, start], prefix["count"][:, end] - prefix["count"][:, start]
+
+
+def build_sankey_flows(grid: pd.DataFrame, source: str, target: str):
+    """Precomputes cumulative flows between two columns over the years for the Sankey diagram.
+
+    Args:
+        grid (pd.DataFrame): The grid created by `build_grid`.
+        source (str): The column used for the source nodes, e.g. `company_size`.
+        target (str): The column used for the target nodes, e.g. `experience_level`.
+
+    Returns:
+        dict: The sorted `years`, the `source_labels`, the `target_labels` and the `cumulative`
+              counts with the shape `(years + 1, sources, targets)`, whose first matrix is zero.
+    """
+    flows = build_flow_matrix(grid, source, target, "work_year")
+    matrix = flows["matrix"]
+
+    return {
+        "years": np.asarray(flows["groups"]),
+        "source_labels": flows["source_labels"],
+        "target_labels": flows["target_labels"],
+        "cumulative": np.concatenate([np.zeros((1,) + matrix.shape[1:], dtype=matrix.dtype), matrix.cumsum(axis=0)]),
+    }
+
+
+def range_sankey_links(flows: dict, work_years):
+    """Returns the Sankey diagram links of a range of years.
+
+    Args:
+        flows (dict): The flows created by `build_sankey_flows`.
+        work_years (list of int): The first and the last year of the range (both included).
+
+    Returns:
+        dict: The output of `get_sankey_links` for the flows summed over the range.
+    """
+    start, end = _year_positions(flows["years"], work_years)
+    matrix = flows["cumulative"][end] - flows["cumulative"][start]
+    return get_sankey_links(matrix, flows["source_labels"], flows["target_labels"])
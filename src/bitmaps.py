@@ -0,0 +1,176 @@
+"""
+Module providing bitmap indexes over the rows of the salaries data.
+
+For every value of an indexed column, a bitmap (a packed bit array with one bit per row) marks the
+rows containing the value. A selection of several values within a column is resolved with bitwise
+OR of their bitmaps and selections in several columns are combined with bitwise AND, so filtering
+never compares whole columns again once the index is built.
+
+The data are partitioned by year (see `src.dataset.Dataset.partitions`), so an index is built for
+every partition and `salary_per_year` reads only the indexes of the selected years.
+
+The bitmaps take a few bytes per row in memory. For data streamed into a memory-mapped snapshot,
+`ScanIndex` answers the same queries by scanning the memory-mapped codes of the columns chunk by
+chunk instead, so the memory needed is bounded by the chunk size.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class BitmapIndex:
+    """Bitmap indexes of the given columns of the salaries data.
+
+    Args:
+        df (pd.DataFrame): The salaries data.
+        columns (list of str): The columns to index.
+    """
+
+    def __init__(self, df: pd.DataFrame, columns: list):
+        self.rows = len(df)
+        self.bitmaps = {}
+
+        for column in columns:
+            categorical = df[column].astype("category").cat
+            codes = categorical.codes.to_numpy()
+            self.bitmaps[column] = {
+                value: np.packbits(codes == code)
+                for code, value in enumerate(categorical.categories.tolist())
+            }
+
+        years = df["work_year"].to_numpy()
+        self.first_year = int(years.min()) if self.rows else 0
+        # compact per-row columns, the salaries are used as they are (possibly memory-mapped)
+        self.year_offsets = (years - self.first_year).astype(np.uint8)
+        self.salaries = df["salary_in_usd"].to_numpy()
+
+    def select(self, selection: dict):
+        """Returns the rows matching the selection.
+
+        Args:
+            selection (dict): A dictionary mapping a column to the list of selected values.
+                              Columns with no selected values are not filtered.
+
+        Returns:
+            np.ndarray: A boolean mask of the matching rows.
+        """
+        result = None
+
+        for column, values in selection.items():
+            if not values:
+                continue
+
+            empty = np.zeros((self.rows + 7) // 8, dtype=np.uint8)
+            bitmaps = [self.bitmaps[column].get(value, empty) for value in values]
+            column_bitmap = np.bitwise_or.reduce(bitmaps)
+            result = column_bitmap if result is None else result & column_bitmap
+
+        if result is None:
+            return np.ones(self.rows, dtype=bool)
+        return np.unpackbits(result, count=self.rows).view(bool)
+
+    def salary_per_year(self, selection: dict):
+        """Returns the average salary per year of the rows matching the selection.
+
+        Args:
+            selection (dict): A dictionary mapping a column to the list of selected values.
+
+        Returns:
+            pd.DataFrame: A data frame with the `work_year` and the average `salary_in_usd` columns.
+        """
+        mask = self.select(selection)
+        offsets = self.year_offsets[mask]
+
+        sums = np.bincount(offsets, weights=self.salaries[mask])
+        counts = np.bincount(offsets)
+        years = np.nonzero(counts)[0]
+
+        return pd.DataFrame({
+            "work_year": years + self.first_year,
+            "salary_in_usd": sums[years] / counts[years],
+        })
+
+
+class ScanIndex:
+    """Answers the queries of `BitmapIndex` by scanning the columns of the salaries data in chunks.
+
+    Nothing is computed per row in advance, the categorical columns are compared by their codes,
+    so memory-mapped data are never copied whole.
+
+    Args:
+        df (pd.DataFrame): The salaries data.
+        columns (list of str): The columns which can be filtered.
+        chunk_size (int): The number of rows scanned at once.
+    """
+
+    def __init__(self, df: pd.DataFrame, columns: list, chunk_size: int):
+        self.df = df
+        self.columns = columns
+        self.chunk_size = chunk_size
+
+    def _column_filter(self, column: str, values: list):
+        array = self.df[column].array
+        if isinstance(array, pd.Categorical):
+            # a lookup table by the code, the last item is for the missing values (code -1)
+            selected = np.zeros(len(array.categories) + 1, dtype=bool)
+            codes = array.categories.get_indexer(values)
+            selected[codes[codes >= 0]] = True
+            return lambda start, stop: selected[array.codes[start:stop]]
+
+        column_values = self.df[column].to_numpy()
+        return lambda start, stop: np.isin(column_values[start:stop], values)
+
+    def salary_per_year(self, selection: dict):
+        """Returns the average salary per year of the rows matching the selection.
+
+        Args:
+            selection (dict): A dictionary mapping a column to the list of selected values.
+                              Columns with no selected values are not filtered.
+
+        Returns:
+            pd.DataFrame: A data frame with the `work_year` and the average `salary_in_usd` columns.
+        """
+        filters = [self._column_filter(column, values) for column, values in selection.items() if values]
+        years = self.df["work_year"].to_numpy()
+        salaries = self.df["salary_in_usd"].to_numpy()
+        sums = {}
+        counts = {}
+
+        for start in range(0, len(self.df), self.chunk_size):
+            stop = start + self.chunk_size
+            mask = np.ones(len(years[start:stop]), dtype=bool)
+            for column_filter in filters:
+                mask &= column_filter(start, stop)
+
+            chunk_years, inverse = np.unique(years[start:stop][mask], return_inverse=True)
+            chunk_sums = np.bincount(inverse, weights=salaries[start:stop][mask], minlength=len(chunk_years))
+            chunk_counts = np.bincount(inverse, minlength=len(chunk_years))
+            for year, total, count in zip(chunk_years.tolist(), chunk_sums, chunk_counts):
+                sums[year] = sums.get(year, 0) + total
+                counts[year] = counts.get(year, 0) + count
+
+        years = sorted(counts)
+        return pd.DataFrame({
+            "work_year": np.array(years, dtype=np.int64),
+            "salary_in_usd": np.array([sums[year] / counts[year] for year in years], dtype=float),
+        })
+
+
+def salary_per_year(indexes: dict, selection: dict, work_years=None):
+    """Returns the average salary per year of the rows matching the selection in a range of years.
+
+    Args:
+        indexes (dict): A dictionary mapping a year to the `BitmapIndex` or `ScanIndex` of its partition.
+        selection (dict): A dictionary mapping a column to the list of selected values.
+        work_years (list of int or None): The first and the last year of the range (both included).
+                                          If None, all years are used.
+
+    Returns:
+        pd.DataFrame: A data frame with the `work_year` and the average `salary_in_usd` columns.
+    """
+    start, end = work_years or (-np.inf, np.inf)
+    results = [index.salary_per_year(selection) for year, index in indexes.items() if start <= year <= end]
+
+    if not results:
+        return pd.DataFrame({"work_year": np.empty(0, dtype=np.int64), "salary_in_usd": np.empty(0)})
+    return pd.concat(results, ignore_index=True)
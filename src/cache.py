@@ -0,0 +1,271 @@
+"""
+Module providing a cache for the figures returned by the callbacks.
+
+Figures are cached under a key derived from the callback name, its input values and the dataset
+version, so a cache hit skips both the data processing and the figure construction. The cached
+figures are stored as JSON in one of the backends:
+
+- `MemoryBackend` keeps the figures in the memory of the current process.
+- `DiskBackend` keeps the figures in a directory shared by all workers running on the same host.
+
+Both backends evict the least recently used figures once the number of entries or their total
+size exceeds the configured limits. The backend is selected with the `DASHBOARD_FIGURE_CACHE`
+environment variable (`memory`, `disk` or `none`).
+
+Identical requests arriving at the same time (e.g. many users opening a shared link with the
+default inputs) are coalesced by `SingleFlight`: the first one computes the figure and the others
+wait for its result instead of computing it again, even when caching is disabled.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import plotly.io as pio
+
+from src.dataset import CACHE_DIR, current
+
+
+class MemoryBackend:
+    """Stores the cached values in the memory of the current process."""
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes):
+        with self._lock:
+            if key in self._entries:
+                self._size -= len(self._entries.pop(key))
+            self._entries[key] = value
+            self._size += len(value)
+
+            while self._entries and (len(self._entries) > self.max_entries or self._size > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+
+class DiskBackend:
+    """Stores the cached values as files in a directory shared by all worker processes.
+
+    The modification time of a file is refreshed on every hit and the files with the oldest
+    modification time are evicted first.
+    """
+
+    def __init__(self, directory: str, max_entries: int = 1024, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return value
+
+    def set(self, key: str, value: bytes):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(value)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+
+        entries.sort()
+        count = len(entries)
+        size = sum(entry[1] for entry in entries)
+
+        for _, entry_size, path in entries:
+            if count <= self.max_entries and size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            count -= 1
+            size -= entry_size
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Shares one computation among concurrent calls with the same key."""
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, func):
+        """Calls the function, or waits for the call already in progress under the same key.
+
+        Args:
+            key (str): The key identifying identical calls.
+            func (callable): The function to call without arguments.
+
+        Returns:
+            tuple: The result of the function (or the exception raised by it is raised again)
+                   and whether the call was shared with another caller.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = func()
+            return flight.result, False
+        except BaseException as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+
+class FigureCache:
+    """Caches the figures returned by the callbacks in the given backend.
+
+    Args:
+        backend (MemoryBackend or DiskBackend or None): The storage of the cached figures.
+                                                        If None, caching is disabled.
+        dataset (callable): Returns the current dataset.
+    """
+
+    def __init__(self, backend=None, dataset=current):
+        self.backend = backend
+        self.dataset = dataset
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._flights = SingleFlight()
+        self._lock = threading.Lock()
+
+    def stats(self):
+        """Returns the hit and miss counters of the current process.
+
+        Returns:
+            dict: A dictionary with the `hits`, `misses`, the number of `coalesced` calls which
+                  waited for an identical call in progress and the name of the `backend`.
+        """
+        return {
+            "backend": type(self.backend).__name__ if self.backend else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
+
+    def make_key(self, name: str, version: str, args: tuple, kwargs: dict):
+        """Creates a cache key from the callback name, the dataset version and the input values."""
+        payload = json.dumps([name, version, args, kwargs], sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def memoize(self, func):
+        """Decorates a callback returning a figure, so its results are cached and concurrent
+        identical calls are computed only once.
+
+        The dataset is read once per call and passed to the callback as the `dataset` keyword
+        argument, so the figure is always computed from the version of the data in its key.
+        """
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            dataset = self.dataset()
+            key = self.make_key(name, dataset.version, args, kwargs)
+
+            if self.backend is not None:
+                value = self.backend.get(key)
+                if value is not None:
+                    self._count("hits")
+                    return json.loads(value)
+
+            def compute():
+                # the figure may have been cached by an identical call finished in the meantime
+                value = self.backend.get(key) if self.backend is not None else None
+                if value is not None:
+                    return json.loads(value)
+
+                self._count("misses")
+                figure = func(*args, dataset=dataset, **kwargs)
+                if self.backend is not None:
+                    self.backend.set(key, pio.to_json(figure, validate=False).encode())
+                return figure
+
+            figure, shared = self._flights.do(key, compute)
+            if shared:
+                self._count("coalesced")
+            return figure
+
+        return wrapper
+
+
+def create_backend(kind: str = os.environ.get("DASHBOARD_FIGURE_CACHE", "memory")):
+    """Creates the cache backend of the given kind.
+
+    Args:
+        kind (str): One of `memory`, `disk` or `none`.
+
+    Returns:
+        MemoryBackend or DiskBackend or None: The backend, None if caching is disabled.
+    """
+    if kind == "memory":
+        return MemoryBackend()
+    if kind == "disk":
+        return DiskBackend(os.path.join(CACHE_DIR, "figures"))
+    if kind == "none":
+        return None
+    raise ValueError(f"Unknown figure cache backend: {kind}")
+
+
+figure_cache = FigureCache(create_backend())
@@ -0,0 +1,76 @@
+"""
+Module resolving the ISO-2 country codes used in the dataset to ISO-3 codes and official names.
+
+Resolved codes are kept in a JSON file next to the dataset cache, so `pycountry` (which is slow to
+import and to query) is only used when a code that has not been seen before appears in the data.
+"""
+
+import json
+import os
+import threading
+
+import pandas as pd
+
+from src.dataset import CACHE_DIR
+
+COUNTRY_INDEX_PATH = os.path.join(CACHE_DIR, "countries.json")
+
+_index = None
+_lock = threading.Lock()
+
+
+def _load_index():
+    try:
+        with open(COUNTRY_INDEX_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_index(index: dict):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{COUNTRY_INDEX_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False, sort_keys=True)
+        os.replace(tmp_path, COUNTRY_INDEX_PATH)
+    except OSError:
+        pass
+
+
+def _lookup(code: str):
+    import pycountry
+
+    try:
+        country = pycountry.countries.lookup(code)
+    except LookupError:
+        return [None, None]
+    return [country.alpha_3, getattr(country, "official_name", country.name)]
+
+
+def resolve_countries(codes):
+    """Resolves ISO-2 country codes to ISO-3 codes and official names.
+
+    Args:
+        codes (iterable of str): The ISO-2 country codes.
+
+    Returns:
+        pd.DataFrame: A data frame indexed by the unique ISO-2 codes with the `iso3` and
+                      `official_name` columns. Both are None for codes which cannot be resolved.
+    """
+    global _index
+    codes = pd.unique(pd.Series(list(codes), dtype=object))
+
+    with _lock:
+        if _index is None:
+            _index = _load_index()
+
+        missing = [code for code in codes if code not in _index]
+        if missing:
+            _index = {**_index, **{code: _lookup(code) for code in missing}}
+            _save_index(_index)
+
+        index = _index
+
+    # object columns keep None for unresolved codes, inferred string columns would hold NaN
+    return pd.DataFrame([index[code] for code in codes], index=codes, columns=["iso3", "official_name"], dtype=object)
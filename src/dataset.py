@@ -0,0 +1,584 @@
+"""
+Module providing the salaries dataset shared by all pages.
+
+The CSV file is parsed only once per process. Only the columns used by the pages are loaded and
+the low-cardinality columns are stored as categoricals or small integers. The parsed data are kept
+in a binary (Parquet) cache file per year next to the CSV file and reused as long as the CSV file
+does not change.
+
+The data are accessed through `current()`, which returns an immutable `Dataset` holding the data
+partitioned by `work_year`, its aggregates and a version. When the CSV file changes, `reload()` builds a new `Dataset` and swaps
+it in atomically. Rows appended to the end of the file are ingested incrementally, i.e. only the new
+rows are parsed and their aggregates are merged into the existing ones. `watch()` runs the reload
+periodically in a background thread. If a memory-mapped snapshot built by `src.snapshot` exists,
+the data are opened from it instead of the CSV file. Appended rows touch only the partitions of
+their years, the other partitions are kept as they are.
+
+Files too large to be parsed at once are streamed: with `DASHBOARD_CHUNK_SIZE` set, the CSV file
+is read in chunks that are written to a new snapshot and folded into the aggregates one by one,
+so the memory needed is bounded by the chunk size and the data are then used memory-mapped.
+Rows appended later are written to the snapshot partitions of their years only.
+
+Nothing is loaded at import time. Pages register the functions preparing their data with
+`register_preparer()`, and the data are loaded and prepared on first use or in the background by
+`warm_up()`. `is_ready()` tells whether the data of all pages are prepared.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import shutil
+import threading
+import time
+import weakref
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from src import profiling
+from src.aggregates import build_grid, build_sketches, merge_grids, merge_sketches
+from src.snapshot import append_snapshot, read_snapshot, read_snapshot_version, split_partitions, stream_snapshot
+
+logger = logging.getLogger(__name__)
+
+DATA_PATH = os.environ.get("DASHBOARD_DATA", "data/salaries.csv")
+CACHE_DIR = os.environ.get("DASHBOARD_CACHE_DIR", os.path.join(os.path.dirname(DATA_PATH), ".cache"))
+SNAPSHOT_DIR = os.environ.get("DASHBOARD_SNAPSHOT", os.path.join(os.path.dirname(DATA_PATH), "snapshot"))
+WATCH_INTERVAL = float(os.environ.get("DASHBOARD_WATCH_INTERVAL", "60"))
+# number of rows read at once when streaming the CSV file into the snapshot, 0 loads it whole
+CHUNK_SIZE = int(os.environ.get("DASHBOARD_CHUNK_SIZE", "0"))
+
+COLUMN_DTYPES = {
+    "work_year": "int16",
+    "experience_level": "category",
+    "employment_type": "category",
+    "job_title": "category",
+    "salary_in_usd": "int64",
+    "remote_ratio": "int8",
+    "company_location": "category",
+    "company_size": "category",
+}
+
+# number of bytes before the end of the loaded data used to check that the file was only appended to
+TAIL_SIZE = 1024
+
+
+class Dataset:
+    """A consistent version of the salaries data together with its aggregates.
+
+    A dataset is never modified once created, a reload creates a new one. Callbacks should get
+    the dataset once with `current()` and use it for all their work.
+
+    Attributes:
+        partitions (dict): The salaries data by year, mapping a year to a frame of its rows.
+        grid (pd.DataFrame): The sum/count grid created by `src.aggregates.build_grid`.
+        sketches (pd.DataFrame): The quantile sketches created by `src.aggregates.build_sketches`.
+        version (str): Identifies the content of the dataset.
+        size (int): The number of bytes of the CSV file the dataset was loaded from.
+        tail (bytes): The last bytes of the CSV file the dataset was loaded from.
+    """
+
+    def __init__(
+        self,
+        partitions: dict,
+        grid: pd.DataFrame,
+        sketches: pd.DataFrame,
+        version: str,
+        size: int = 0,
+        tail: bytes = b"",
+    ):
+        self.partitions = partitions
+        self.grid = grid
+        self.sketches = sketches
+        self.version = version
+        self.size = size
+        self.tail = tail
+        self._derived = {}
+        # builders may derive other data of the same dataset, e.g. a static figure from the page data
+        self._lock = threading.RLock()
+
+    @property
+    def rows(self):
+        """The number of rows of the data."""
+        return sum(len(df) for df in self.partitions.values())
+
+    def select_partitions(self, work_years=None):
+        """Returns the partitions of a range of years.
+
+        Args:
+            work_years (list of int or None): The first and the last year of the range (both included).
+                                              If None, all partitions are returned.
+
+        Returns:
+            dict: A dictionary mapping a year of the range to a frame of its rows.
+        """
+        if not work_years:
+            return self.partitions
+
+        start, end = work_years
+        return {year: df for year, df in self.partitions.items() if start <= year <= end}
+
+    def derive(self, name: str, builder):
+        """Returns data derived from the dataset, building them only once per dataset version.
+
+        Args:
+            name (str): A unique name of the derived data.
+            builder (callable): A function creating the derived data from the dataset.
+
+        Returns:
+            The result of `builder(self)`.
+        """
+        if name not in self._derived:
+            with self._lock:
+                if name not in self._derived:
+                    self._derived[name] = builder(self)
+        return self._derived[name]
+
+    def derive_partition(self, name: str, year, builder):
+        """Returns data derived from one partition, building them only once per partition.
+
+        Partitions not changed by an append are shared by the new version of the dataset, so
+        their data derived by an earlier version are reused.
+
+        Args:
+            name (str): A unique name of the derived data.
+            year (int): The year of the partition.
+            builder (callable): A function creating the derived data from the frame of the partition.
+
+        Returns:
+            The result of `builder(self.partitions[year])`.
+        """
+        df = self.partitions[year]
+        key = (name, id(df))
+
+        with _partition_lock:
+            entry = _partition_derived.get(key)
+        if entry is not None and entry[0]() is df:
+            return entry[1]
+
+        value = builder(df)
+        with _partition_lock:
+            if key not in _partition_derived:
+                # the entry is dropped together with the frame, so the id is never reused for another one
+                weakref.finalize(df, _partition_derived.pop, key, None)
+            _partition_derived[key] = (weakref.ref(df), value)
+        return value
+
+
+# data derived from partitions by `Dataset.derive_partition`, by the name and the id of the frame
+_partition_derived = {}
+_partition_lock = threading.Lock()
+
+
+def get_fingerprint(stat: os.stat_result):
+    """Returns a short fingerprint identifying the content of the CSV file.
+
+    Args:
+        stat (os.stat_result): The status of the CSV file.
+
+    Returns:
+        str: A hex digest derived from the file size and modification time.
+    """
+    return hashlib.sha1(f"{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()[:16]
+
+
+def read_salaries_csv(source, **kwargs):
+    """Parses salaries in the CSV format, keeping only the columns used by the pages.
+
+    Args:
+        source (str or file-like): Path to the CSV file or a buffer with the CSV data.
+        **kwargs: Additional arguments passed to `pd.read_csv`.
+
+    Returns:
+        pd.DataFrame: The parsed data with compact column types.
+    """
+    return pd.read_csv(source, usecols=list(COLUMN_DTYPES), dtype=COLUMN_DTYPES, **kwargs)
+
+
+def _cache_path(fingerprint: str):
+    return os.path.join(CACHE_DIR, f"salaries-{fingerprint}")
+
+
+def _remove_stale_cache(keep: str):
+    for name in os.listdir(CACHE_DIR):
+        path = os.path.join(CACHE_DIR, name)
+        # the caches still being written by other processes end with .tmp
+        if name.startswith("salaries-") and not name.endswith(".tmp") and path != keep:
+            try:
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+def _write_cache(partitions: dict, fingerprint: str, previous: Dataset = None):
+    """Writes a cache file per partition, the partitions shared with the previous dataset are linked."""
+    cache_path = _cache_path(fingerprint)
+    previous_path = _cache_path(previous.version) if previous is not None else None
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for year, df in partitions.items():
+            name = f"{year}.parquet"
+            if previous is not None and previous.partitions.get(year) is df:
+                try:
+                    os.link(os.path.join(previous_path, name), os.path.join(tmp_path, name))
+                    continue
+                except OSError:
+                    pass
+            df.to_parquet(os.path.join(tmp_path, name), index=False)
+        shutil.rmtree(cache_path, ignore_errors=True)
+        os.replace(tmp_path, cache_path)
+        _remove_stale_cache(keep=cache_path)
+    except (OSError, ImportError):
+        # the cache is only an optimization, the app works without it
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def _read_cache(fingerprint: str):
+    cache_path = _cache_path(fingerprint)
+    names = sorted(os.listdir(cache_path), key=lambda name: int(name.split(".")[0]))
+    return {int(name.split(".")[0]): pd.read_parquet(os.path.join(cache_path, name)) for name in names}
+
+
+def load_partitions(path: str = DATA_PATH, fingerprint: str = None):
+    """Loads the salaries data by year, using the binary cache when the CSV file has not changed.
+
+    Args:
+        path (str): Path to the CSV file.
+        fingerprint (str or None): The fingerprint of the CSV file, computed if not given.
+
+    Returns:
+        dict: A dictionary mapping a year to a frame of its rows with compact column types.
+    """
+    fingerprint = fingerprint or get_fingerprint(os.stat(path))
+
+    try:
+        return _read_cache(fingerprint)
+    except (OSError, ImportError, ValueError):
+        pass
+
+    partitions = split_partitions(read_salaries_csv(path))
+    _write_cache(partitions, fingerprint)
+    return partitions
+
+
+def _read_tail(path: str, size: int):
+    with open(path, "rb") as f:
+        f.seek(max(size - TAIL_SIZE, 0))
+        return f.read(size - max(size - TAIL_SIZE, 0))
+
+
+class _FileRange(io.RawIOBase):
+    """Reads a file from its current position up to a number of bytes."""
+
+    def __init__(self, file, size: int):
+        self._file = file
+        self._remaining = size
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        read = self._file.readinto(memoryview(buffer)[:self._remaining])
+        self._remaining -= read
+        return read
+
+
+def _iter_appended_rows(path: str, start: int, end: int, chunk_size: int):
+    with open(path, "rb") as f:
+        columns = f.readline().decode().strip().split(",")
+        f.seek(start)
+        source = io.BufferedReader(_FileRange(f, end - start))
+        if not chunk_size:
+            yield read_salaries_csv(source, header=None, names=columns)
+            return
+        with read_salaries_csv(source, header=None, names=columns, chunksize=chunk_size) as chunks:
+            yield from chunks
+
+
+def _read_appended_rows(path: str, dataset: Dataset, size: int, chunk_size: int = 0):
+    """Parses the rows appended after the data of the dataset, None if the file was rewritten.
+
+    With `chunk_size`, the rows are returned as an iterator of chunks parsed only when iterated.
+    """
+    if not dataset.tail.endswith(b"\n") or _read_tail(path, dataset.size) != dataset.tail:
+        return None
+
+    chunks = _iter_appended_rows(path, dataset.size, size, chunk_size)
+    return chunks if chunk_size else next(chunks)
+
+
+def _concat(frames: list):
+    """Concatenates parts of the data, merging the categories of the categorical columns."""
+    columns = {}
+    for column in frames[0].columns:
+        if isinstance(frames[0][column].dtype, pd.CategoricalDtype):
+            columns[column] = union_categoricals([df[column] for df in frames], ignore_order=True)
+        else:
+            columns[column] = np.concatenate([df[column].to_numpy() for df in frames])
+    return pd.DataFrame(columns)
+
+
+def _append_partitions(partitions: dict, rows: pd.DataFrame):
+    """Appends rows to the partitions of their years, the other partitions are reused as they are."""
+    partitions = dict(partitions)
+    for year, year_rows in split_partitions(rows).items():
+        partitions[year] = _concat([partitions[year], year_rows]) if year in partitions else year_rows
+    return dict(sorted(partitions.items()))
+
+
+def _apply_changes(dataset: Dataset, path: str):
+    """Returns the dataset with the changes of the CSV file applied.
+
+    Appended rows are ingested incrementally, only the partitions of their years are changed.
+    With `CHUNK_SIZE` set, the rows are appended to the snapshot and the dataset is opened from it,
+    unless another worker has already done so.
+    None is returned if the file was rewritten and has to be loaded again.
+    """
+    stat = os.stat(path)
+    fingerprint = get_fingerprint(stat)
+
+    if fingerprint == dataset.version:
+        return dataset
+
+    tail = _read_tail(path, stat.st_size)
+    if not tail.endswith(b"\n"):
+        # the last row is still being written, pick up the change on the next reload
+        return dataset
+
+    if CHUNK_SIZE and read_snapshot_version(SNAPSHOT_DIR) == fingerprint:
+        # another worker has already written the change to the snapshot
+        return Dataset(**read_snapshot(SNAPSHOT_DIR))
+
+    rows = _read_appended_rows(path, dataset, stat.st_size, CHUNK_SIZE) if stat.st_size > dataset.size else None
+    if rows is None:
+        return None
+
+    if CHUNK_SIZE:
+        logger.info("Ingesting %d bytes appended to %s", stat.st_size - dataset.size, path)
+        # the partitions stay memory-mapped, only the ones of the new rows are written again
+        if not append_snapshot(SNAPSHOT_DIR, dataset.version, rows, fingerprint, stat.st_size, tail, CHUNK_SIZE):
+            return None
+        return Dataset(**read_snapshot(SNAPSHOT_DIR))
+
+    logger.info("Ingesting %d rows appended to %s", len(rows), path)
+
+    partitions = _append_partitions(dataset.partitions, rows)
+    grid = merge_grids(dataset.grid, build_grid(rows))
+    sketches = merge_sketches(dataset.sketches, build_sketches(rows))
+    _write_cache(partitions, fingerprint, previous=dataset)
+
+    return Dataset(partitions, grid, sketches, fingerprint, stat.st_size, tail)
+
+
+def stream_dataset(path: str = DATA_PATH, directory: str = SNAPSHOT_DIR, chunk_size: int = CHUNK_SIZE):
+    """Streams the CSV file into a new snapshot in chunks and opens it.
+
+    Args:
+        path (str): Path to the CSV file.
+        directory (str): The snapshot directory.
+        chunk_size (int): The number of rows read at once.
+
+    Returns:
+        Dataset: The dataset opened from the new snapshot.
+    """
+    stat = os.stat(path)
+
+    with read_salaries_csv(path, chunksize=chunk_size) as chunks:
+        stream_snapshot(directory, chunks, get_fingerprint(stat), stat.st_size, _read_tail(path, stat.st_size))
+
+    return Dataset(**read_snapshot(directory))
+
+
+def load_dataset(path: str = DATA_PATH, use_snapshot: bool = True):
+    """Loads the dataset and computes its aggregates.
+
+    The memory-mapped snapshot (see `src.snapshot`) is used if it exists, rows appended to the CSV
+    file after the snapshot was built are ingested incrementally. Otherwise the data are loaded
+    from the CSV file or its binary cache, or streamed into a new snapshot if `CHUNK_SIZE` is set.
+
+    Args:
+        path (str): Path to the CSV file.
+        use_snapshot (bool): Whether to use the snapshot.
+
+    Returns:
+        Dataset: The loaded dataset.
+    """
+    if use_snapshot:
+        with profiling.timed("open snapshot"):
+            snapshot = read_snapshot(SNAPSHOT_DIR)
+
+        if snapshot is not None:
+            if snapshot["sketches"] is None:
+                # snapshots written before the sketches were introduced
+                snapshot["sketches"] = merge_sketches(*map(build_sketches, snapshot["partitions"].values()))
+            dataset = _apply_changes(Dataset(**snapshot), path)
+            if dataset is not None:
+                return dataset
+
+    if CHUNK_SIZE:
+        with profiling.timed("stream dataset"):
+            return stream_dataset(path, SNAPSHOT_DIR, CHUNK_SIZE)
+
+    stat = os.stat(path)
+    fingerprint = get_fingerprint(stat)
+
+    with profiling.timed("load dataset"):
+        partitions = load_partitions(path, fingerprint)
+    with profiling.timed("build aggregate grid"):
+        grid = merge_grids(*map(build_grid, partitions.values()))
+    with profiling.timed("build quantile sketches"):
+        sketches = merge_sketches(*map(build_sketches, partitions.values()))
+
+    return Dataset(partitions, grid, sketches, fingerprint, stat.st_size, _read_tail(path, stat.st_size))
+
+
+_current = None
+_lock = threading.RLock()
+_preparers = {}
+
+
+def register_preparer(name: str, builder):
+    """Registers a function preparing data derived from the dataset, e.g. the data of a page.
+
+    The registered functions are run by `prepare()` for every new version of the dataset.
+
+    Args:
+        name (str): A unique name of the derived data, see `Dataset.derive`.
+        builder (callable): A function creating the derived data from the dataset.
+    """
+    _preparers[name] = builder
+
+
+def prepare(dataset: Dataset):
+    """Prepares the data of all registered preparers for the dataset.
+
+    Args:
+        dataset (Dataset): The dataset to prepare the data for.
+
+    Returns:
+        Dataset: The prepared dataset.
+    """
+    for name, builder in list(_preparers.items()):
+        with profiling.timed(f"prepare {name}"):
+            dataset.derive(name, builder)
+    return dataset
+
+
+def current():
+    """Returns the current version of the dataset, loading it on the first call.
+
+    Returns:
+        Dataset: The current dataset.
+    """
+    global _current
+    if _current is None:
+        with _lock:
+            if _current is None:
+                _current = load_dataset()
+    return _current
+
+
+def is_ready():
+    """Returns whether the dataset is loaded and the data of all registered preparers are prepared."""
+    dataset = _current
+    return dataset is not None and all(name in dataset._derived for name in _preparers)
+
+
+def warm_up():
+    """Loads the dataset and prepares the data of all pages in a background thread.
+
+    Returns:
+        threading.Thread: The started daemon thread.
+    """
+    def run():
+        try:
+            prepare(current())
+        except Exception:
+            logger.exception("Preparing the dataset failed")
+
+    thread = threading.Thread(target=run, name="dataset-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def set_current(dataset: Dataset):
+    """Prepares the dataset and makes it the current one.
+
+    Args:
+        dataset (Dataset): The new current dataset.
+
+    Returns:
+        Dataset: The current dataset.
+    """
+    global _current
+    with _lock:
+        _current = prepare(dataset)
+        return _current
+
+
+def get_version():
+    """Returns the version of the current dataset.
+
+    The version changes whenever the data behind the pages change, so it can be used as a part of
+    cache keys.
+
+    Returns:
+        str: The version of the current dataset.
+    """
+    return current().version
+
+
+def reload(path: str = DATA_PATH):
+    """Swaps in a new version of the dataset if the CSV file has changed.
+
+    If rows were only appended to the file, just the new rows are parsed and their aggregates are
+    merged into the current ones. Otherwise the whole file is loaded again.
+
+    Args:
+        path (str): Path to the CSV file.
+
+    Returns:
+        Dataset: The current dataset after the reload.
+    """
+    with _lock:
+        dataset = current()
+        updated = _apply_changes(dataset, path)
+
+        if updated is dataset:
+            return dataset
+
+        if updated is None:
+            logger.info("Loading changed %s", path)
+            updated = load_dataset(path, use_snapshot=False)
+
+        return set_current(updated)
+
+
+def watch(path: str = DATA_PATH, interval: float = WATCH_INTERVAL):
+    """Starts a background thread reloading the dataset whenever the CSV file changes.
+
+    Args:
+        path (str): Path to the CSV file.
+        interval (float): The number of seconds between two checks of the file.
+
+    Returns:
+        threading.Thread: The started daemon thread.
+    """
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                reload(path)
+            except Exception:
+                logger.exception("Reloading %s failed", path)
+
+    thread = threading.Thread(target=run, name="dataset-watcher", daemon=True)
+    thread.start()
+    return thread
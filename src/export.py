@@ -0,0 +1,200 @@
+"""
+Module exporting the salaries data matching the selected filters.
+
+The `/_export/salaries.csv` and `/_export/salaries.parquet` routes return the rows matching the
+filters given in the query string (e.g. `?experience_level=SE&experience_level=MI`). The rows are
+filtered and serialized in chunks of `EXPORT_CHUNK_SIZE` rows and streamed to the client as they
+are produced, so neither the filtered frame nor the whole file is ever held in memory. The data are
+read partition by partition, with `work_year` in the query string only the partitions of the given
+years are read.
+
+The links are created with `export_links` and kept in sync with the filters of a page by
+a clientside callback registered with `register_export_links`.
+"""
+
+import io
+import json
+
+import dash
+import pyarrow as pa
+import pyarrow.parquet as pq
+from dash import html
+from dash.dependencies import Input, Output, State
+from flask import Response, abort, request
+
+from src.dataset import current
+
+ROUTE = "/_export/"
+
+EXPORT_CHUNK_SIZE = 100_000
+
+FILTER_COLUMNS = ["experience_level", "employment_type", "company_size", "job_title", "company_location"]
+
+FORMATS = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+class _ChunkSink(io.RawIOBase):
+    """A file collecting the written bytes until they are taken, the Parquet writer writes into it."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def take(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_filtered(partitions, selection: dict, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """Yields the rows of the data matching the selection in chunks.
+
+    Args:
+        partitions (iterable of pd.DataFrame): The partitions of the salaries data.
+        selection (dict): A dictionary mapping a column to the list of selected values.
+                          Columns with no selected values are not filtered.
+        chunk_size (int): The number of rows of the data filtered at once.
+
+    Yields:
+        pd.DataFrame: The matching rows of a chunk of the data.
+    """
+    for df in partitions:
+        for start in range(0, len(df), chunk_size):
+            chunk = df.iloc[start:start + chunk_size]
+            mask = None
+            for column, values in selection.items():
+                if values:
+                    column_mask = chunk[column].isin(values).to_numpy()
+                    mask = column_mask if mask is None else mask & column_mask
+            yield chunk if mask is None else chunk[mask]
+
+
+def _iter_csv(partitions: list, selection: dict):
+    # the header is written even when no row matches
+    yield partitions[0].iloc[:0].to_csv(index=False).encode()
+    for chunk in iter_filtered(partitions, selection):
+        if len(chunk):
+            yield chunk.to_csv(index=False, header=False).encode()
+
+
+def _iter_parquet(partitions: list, selection: dict):
+    sink = _ChunkSink()
+    # the schema is the same for every chunk, the categories differ between the partitions,
+    # so the categorical columns are written as dictionaries of strings with 32-bit indices
+    schema = pa.Schema.from_pandas(partitions[0].iloc[:0], preserve_index=False)
+    schema = pa.schema(
+        [
+            pa.field(field.name, pa.dictionary(pa.int32(), pa.string())) if pa.types.is_dictionary(field.type) else field
+            for field in schema
+        ],
+        metadata=schema.metadata,
+    )
+
+    with pq.ParquetWriter(sink, schema) as writer:
+        for chunk in iter_filtered(partitions, selection):
+            if len(chunk):
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+                yield sink.take()
+    yield sink.take()
+
+
+def serve_export(extension: str):
+    """Flask view streaming the rows matching the filters in the query string."""
+    if extension not in FORMATS:
+        abort(404)
+
+    selection = {column: request.args.getlist(column) for column in FILTER_COLUMNS}
+    work_years = request.args.getlist("work_year", type=int)
+    all_partitions = current().partitions
+    # an empty slice keeps the columns when no partition is selected
+    partitions = [df for year, df in all_partitions.items() if not work_years or year in work_years] or [
+        next(iter(all_partitions.values())).iloc[:0]
+    ]
+
+    rows = _iter_csv(partitions, selection) if extension == "csv" else _iter_parquet(partitions, selection)
+
+    response = Response(rows, mimetype=FORMATS[extension])
+    response.headers["Content-Disposition"] = f"attachment; filename=salaries.{extension}"
+    return response
+
+
+def init_app(server):
+    """Adds the export routes to the Flask server.
+
+    Args:
+        server (flask.Flask): The server behind the Dash app.
+    """
+    server.add_url_rule(f"{ROUTE}salaries.<extension>", "export", serve_export)
+
+
+def export_links(id: str):
+    """Creates the links downloading the filtered data as CSV and Parquet.
+
+    The links need a clientside callback registered with `register_export_links`.
+
+    Args:
+        id (str): The prefix of the IDs of the links.
+
+    Returns:
+        html.Div: A Div component containing the links.
+    """
+    return html.Div([
+        html.A(
+            "Download CSV",
+            href=dash.get_relative_path(f"{ROUTE}salaries.csv"),
+            id=f"{id}-csv",
+            className="export-link",
+        ),
+        html.A(
+            "Download Parquet",
+            href=dash.get_relative_path(f"{ROUTE}salaries.parquet"),
+            id=f"{id}-parquet",
+            className="export-link",
+        ),
+    ], className="export-links")
+
+
+def register_export_links(id: str, filters: dict, year_slider: str = None):
+    """Registers a clientside callback adding the selected filter values to the export links.
+
+    Args:
+        id (str): The prefix of the IDs of the links created by `export_links`.
+        filters (dict): A dictionary mapping the ID of a dropdown to the column it filters.
+        year_slider (str or None): The ID of a range slider of years, every year of the selected
+                                   range is added to the links as `work_year`.
+    """
+    dash.clientside_callback(
+        """
+        function(...args) {
+            const columns = %s;
+            const hrefs = args.slice(args.length - 2);
+            const query = new URLSearchParams();
+            columns.forEach((column, i) => (args[i] || []).forEach(value => query.append(column, value)));
+            if (args.length > columns.length + 2 && args[columns.length]) {
+                const [start, end] = args[columns.length];
+                for (let year = start; year <= end; year++) {
+                    query.append("work_year", year);
+                }
+            }
+            const suffix = query.toString() ? "?" + query.toString() : "";
+            return hrefs.map(href => href.split("?")[0] + suffix);
+        }
+        """ % json.dumps(list(filters.values())),
+        [Output(f"{id}-csv", "href"), Output(f"{id}-parquet", "href")],
+        [Input(dropdown, "value") for dropdown in filters] + ([Input(year_slider, "value")] if year_slider else []),
+        [State(f"{id}-csv", "href"), State(f"{id}-parquet", "href")],
+    )
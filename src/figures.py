@@ -0,0 +1,289 @@
+"""
+Module building the figures of the dashboard.
+
+The styling of the figures (the title fonts, the axes and the colors) is kept here, so the pages
+only provide the data.
+
+The figures depending on the filters are built on every callback call. Building them with Plotly
+Express validates the whole figure, including the default template, which takes longer than
+computing their data. Such figures are therefore created once from sample data as a prebuilt
+template (a plain dictionary, see `_template`) and every call only fills in the data arrays.
+The result is the same JSON as the figure built with Plotly Express would be serialized to.
+
+The figures built once per dataset version (the choropleth graph and the remote-ratio chart)
+are still created with Plotly Express.
+"""
+
+import base64
+import functools
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from plotly.colors import sample_colorscale
+
+TITLE_FONT = dict(size=13)
+
+SALARY_COLOR = "#1f77b4"
+
+REMOTE_RATIO_COLORS = {
+    "Onsite": "#1f77b4",
+    "Hybrid": "#D967B5",
+    "Remote": "#ff7f0e"
+}
+
+# the colors of the Sankey nodes are sampled evenly from this scale, so every node has its own color
+SANKEY_COLORS = ["#1f77b4", "#D967B5", "#FF7F46", "#5DADE2", "#F8839E", "#FFA366", "#AE86DB"]
+
+# the years are filled in by `salary_title`
+SALARY_TITLE = "Average annual salary in AI, ML and Data Science {years} worldwide"
+CHOROPLETH_TITLE = "Average Salary by Country in USD"
+
+
+# the short names of the dtypes of plotly.js typed arrays
+_TYPED_ARRAY_DTYPES = {
+    "int8": "i1", "uint8": "u1", "int16": "i2", "uint16": "u2",
+    "int32": "i4", "uint32": "u4", "float32": "f4", "float64": "f8",
+}
+
+
+def _array(values):
+    """Encodes values as a plotly.js typed array the same way plotly serializes numpy arrays.
+
+    64-bit integers, which plotly.js does not support, are narrowed to the smallest type holding
+    the values. Arrays which cannot be encoded are returned as they are.
+    """
+    values = np.ascontiguousarray(values)
+    if values.size == 0:
+        return values
+
+    if values.dtype.kind in "iu" and values.dtype.itemsize == 8:
+        narrow = [np.int8, np.int16, np.int32] if values.dtype.kind == "i" else [np.uint8, np.uint16, np.uint32]
+        low, high = values.min(), values.max()
+        dtype = next((dtype for dtype in narrow if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max), None)
+        if dtype is None:
+            return values
+        values = values.astype(dtype)
+
+    if values.dtype.name not in _TYPED_ARRAY_DTYPES:
+        return values
+    return {"dtype": _TYPED_ARRAY_DTYPES[values.dtype.name], "bdata": base64.b64encode(values).decode("ascii")}
+
+
+def build_choropleth(choropleth_df):
+    """Creates a choropleth graph showing the average annual salary in different countries worldwide
+
+    Args:
+        choropleth_df (pd.DataFrame): The average salary (`avg_salary`) per ISO-3 country code (`company_location`).
+
+    Returns:
+        A plotly figure
+    """
+    fig = px.choropleth(
+        choropleth_df,
+        locations="company_location",
+        color="avg_salary",
+        locationmode="ISO-3",
+        color_continuous_scale="Blues",
+        title=CHOROPLETH_TITLE
+    )
+
+    fig.update_layout(
+        title_font=TITLE_FONT
+    )
+
+    return fig
+
+
+def build_remote_ratio(remote_ratio_counts, selected_ratios, title: str, labels: list):
+    """Creates a line chart showing the number of employees in every work mode over time.
+
+    Args:
+        remote_ratio_counts (pd.DataFrame): The number of employees (`count`) per `work_year` and
+                                            work mode (`label`).
+        selected_ratios (list of str): List of work modes (e.g., "Onsite", "Hybrid", "Remote")
+                                       whose lines are initially visible.
+        title (str): The title of the chart.
+        labels (list of str): All work modes in the order of the legend.
+
+    Returns:
+        plotly.express.Figure: A line chart with one line per work mode.
+    """
+    fig = px.line(
+        remote_ratio_counts,
+        x="work_year",
+        y="count",
+        color="label",
+        title=title,
+        labels={
+            "work_year": "Year",
+            "count": "Number of Employees",
+            "label": "Work Mode"
+        },
+        markers=True,
+        category_orders={"label": labels},
+        color_discrete_map=REMOTE_RATIO_COLORS
+    )
+
+    fig.update_layout(
+        xaxis=dict(
+            tickmode="array",
+            tickvals=remote_ratio_counts["work_year"].unique(),
+            ticktext=[str(year) for year in remote_ratio_counts["work_year"].unique()],
+        ),
+        yaxis=dict(
+            rangemode="tozero"
+        )
+    )
+
+    fig.for_each_trace(lambda trace: trace.update(visible=trace.name in selected_ratios))
+    return fig
+
+
+def _build_salary(average_salary_per_year, title: str):
+    fig = px.bar(
+        average_salary_per_year,
+        x="work_year",
+        y="salary_in_usd",
+        title=title,
+        labels={
+            "work_year": "Year",
+            "salary_in_usd": "Average salary in USD"
+        },
+    )
+
+    fig.update_traces(
+        marker_color=SALARY_COLOR
+    )
+
+    fig.update_layout(
+        xaxis=dict(
+            tickmode="array",
+            tickvals=average_salary_per_year["work_year"],
+            ticktext=[str(year) for year in average_salary_per_year["work_year"]],
+            title_font=TITLE_FONT
+        ),
+        yaxis=dict(
+            rangemode="tozero",
+            title_font=TITLE_FONT
+        ),
+        title_font=TITLE_FONT
+    )
+
+    return fig
+
+
+@functools.cache
+def _node_colors(count: int):
+    return tuple(sample_colorscale(SANKEY_COLORS, [i / max(count - 1, 1) for i in range(count)]))
+
+
+def _build_sankey(links, title: str):
+    fig = go.Figure(go.Sankey(
+        node=dict(
+            pad=15,
+            thickness=20,
+            label=links["labels"],
+            color=_node_colors(len(links["labels"]))
+        ),
+        link=dict(
+            source=links["source"],
+            target=links["target"],
+            value=links["value"],
+        )
+    ))
+
+    fig.update_layout(title=title)
+    return fig
+
+
+@functools.cache
+def _template(name: str):
+    """Builds a figure from sample data once and returns it as a dictionary.
+
+    The returned dictionary is shared by all calls, the figures created from it copy
+    every part they change.
+    """
+    if name == "salary":
+        fig = _build_salary(pd.DataFrame({"work_year": [2020], "salary_in_usd": [1.0]}), "")
+    elif name == "sankey":
+        fig = _build_sankey({"labels": ["a", "b"], "source": [0], "target": [1], "value": [1]}, "")
+    else:
+        fig = go.Figure()
+    return fig.to_plotly_json()
+
+
+def salary_title(work_years):
+    """Returns the title of the bar graph of the average annual salary for a range of years.
+
+    Args:
+        work_years (list of int): The first and the last year of the range (both included).
+
+    Returns:
+        str: The title naming the years of the range.
+    """
+    start, end = work_years
+    return SALARY_TITLE.format(years=f"in {start}" if start == end else f"from {start} to {end}")
+
+
+def salary_figure(average_salary_per_year, work_years):
+    """Creates a bar graph showing the average annual salary in AI, ML and Data Science
+
+    Args:
+        average_salary_per_year (pd.DataFrame): The average salary (`salary_in_usd`) per year (`work_year`).
+        work_years (list of int): The first and the last year of the range shown, named in the title.
+
+    Returns:
+        dict: The figure of the bar graph.
+    """
+    template = _template("salary")
+    years = average_salary_per_year["work_year"].to_numpy()
+    salaries = average_salary_per_year["salary_in_usd"].to_numpy()
+
+    layout = template["layout"]
+    trace = template["data"][0]
+
+    return {
+        "data": [{**trace, "x": _array(years), "y": _array(salaries)}],
+        "layout": {
+            **layout,
+            "title": {**layout["title"], "text": salary_title(work_years)},
+            "xaxis": {**layout["xaxis"], "tickvals": _array(years), "ticktext": [str(year) for year in years]},
+        },
+    }
+
+
+def sankey_figure(links, title: str):
+    """Creates a Sankey diagram from the nodes and links.
+
+    Args:
+        links (dict): The nodes and links created by `src.aggregates.get_sankey_links`.
+        title (str): The title of the diagram.
+
+    Returns:
+        dict: The figure of the Sankey diagram.
+    """
+    template = _template("sankey")
+    trace = template["data"][0]
+
+    return {
+        "data": [{
+            **trace,
+            "link": {"source": _array(links["source"]), "target": _array(links["target"]), "value": _array(links["value"])},
+            "node": {**trace["node"], "color": list(_node_colors(len(links["labels"]))), "label": list(links["labels"])},
+        }],
+        "layout": {**template["layout"], "title": {"text": title}},
+    }
+
+
+def empty_figure(title: str):
+    """Creates a blank figure with a title.
+
+    Args:
+        title (str): The title of the figure, e.g. "No data selected".
+
+    Returns:
+        dict: The blank figure.
+    """
+    return {"data": [], "layout": {**_template("empty")["layout"], "title": {"text": title}}}
@@ -1,10 +1,24 @@
 """The main file defines the root structure of the app."""
 
+import argparse
+import os
+
 import dash
 from dash import Dash, html
 import dash_bootstrap_components as dbc
+from flask import jsonify
+from src import dataset, export, metrics, payloads, profiling, server
+from src.cache import figure_cache
 
-app = Dash(__name__, use_pages=True, external_stylesheets=[dbc.themes.BOOTSTRAP, dbc.icons.FONT_AWESOME])
+# the layouts of the pages are functions, suppressing the callback validation keeps Dash from
+# calling them (and loading the data) before the first page is requested
+with profiling.page_imports(os.path.join(os.path.dirname(__file__), "pages")):
+    app = Dash(
+        __name__,
+        use_pages=True,
+        suppress_callback_exceptions=True,
+        external_stylesheets=[dbc.themes.BOOTSTRAP, dbc.icons.FONT_AWESOME]
+    )
 
 # navbar
 navbar = html.Div([
@@ -45,5 +59,96 @@ app.layout = html.Div(
     ]
 )
 
+payloads.init_app(app.server)
+export.init_app(app.server)
+metrics.init_app(app.server)
+
+
+@app.server.route("/_figure-cache")
+def figure_cache_stats():
+    """Returns the hit and miss counters of the figure cache of the current worker."""
+    return jsonify(figure_cache.stats())
+
+
+@app.server.route("/ready")
+def ready():
+    """Returns whether the data of all pages are loaded and prepared (status 503 if not)."""
+    if not dataset.is_ready():
+        return jsonify(ready=False), 503
+    return jsonify(ready=True, version=dataset.get_version())
+
+
+def main():
+    """Runs the dashboard.
+
+    By default the Flask development server is used and the data are loaded and prepared in the
+    background while the server is already running, see the `/ready` route. With `--production`,
+    the dashboard runs in several worker processes, see `src.server`.
+    """
+    parser = argparse.ArgumentParser(description="Dashboard of salaries in AI, ML and Data Science.")
+    parser.add_argument("--bind", default="127.0.0.1:8050", help="address to listen on (default: %(default)s)")
+    parser.add_argument("--debug", action="store_true", help="run the development server in the debug mode")
+    parser.add_argument("--production", action="store_true", help="run several worker processes with gunicorn")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="number of worker processes in the production mode (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=4,
+        help="number of threads per worker process in the production mode (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--graceful-timeout",
+        type=int,
+        default=30,
+        help="seconds the workers have to finish their requests on restart (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--max-requests",
+        type=int,
+        default=0,
+        help="restart a worker gracefully after this number of requests, 0 disables it (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="print the import and preparation time of every page and exit",
+    )
+    args = parser.parse_args()
+
+    if args.profile_startup:
+        dataset.prepare(dataset.current())
+        print(profiling.report())
+        return
+
+    if args.production:
+        try:
+            import gunicorn  # noqa: F401
+        except ImportError:
+            parser.error("the production mode requires gunicorn, install it with `pip install .[production]`")
+
+        server.run_production(
+            app.server,
+            bind=args.bind,
+            workers=args.workers,
+            threads=args.threads,
+            graceful_timeout=args.graceful_timeout,
+            max_requests=args.max_requests,
+        )
+        return
+
+    dataset.warm_up()
+    # pick up changes of the data without restarting the app
+    if dataset.WATCH_INTERVAL > 0:
+        dataset.watch()
+
+    host, port = server.parse_bind(args.bind)
+    app.run(host=host, port=port, debug=args.debug)
+
+
 if __name__ == "__main__":
-    app.run_server()
\ No newline at end of file
+    main()
\ No newline at end of file
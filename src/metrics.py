@@ -0,0 +1,169 @@
+"""
+Module measuring the latency and the response size of the callbacks.
+
+Callbacks decorated with `instrument` record their duration split into the time spent building the
+figure (the code inside `timed("figure")` blocks) and the remaining compute time, and the size of
+the serialized response. The measurements are added as the `Server-Timing` header to the callback
+responses, so they are shown in the network panel of the browser, and collected in histograms per
+page and callback served in the Prometheus text format by the `/metrics` route.
+
+The histograms are kept in memory of each process, in the production mode every worker reports
+its own.
+"""
+
+import contextlib
+import contextvars
+import functools
+import threading
+import time
+
+from flask import Response, g, has_request_context
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+_phases = contextvars.ContextVar("phases", default=None)
+
+
+class Histogram:
+    """A Prometheus histogram with labels.
+
+    Args:
+        name (str): The name of the metric.
+        description (str): The help text of the metric.
+        buckets (tuple of float): The upper bounds of the buckets.
+    """
+
+    def __init__(self, name: str, description: str, buckets: tuple):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        """Records a value.
+
+        Args:
+            value (float): The observed value.
+            **labels: The labels of the series the value belongs to.
+        """
+        key = tuple(sorted(labels.items()))
+
+        with self._lock:
+            series = self._series.setdefault(key, {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def expose(self):
+        """Formats the histogram in the Prometheus text format.
+
+        Returns:
+            str: The lines of the histogram.
+        """
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                labels = ",".join(f'{name}="{value}"' for name, value in key)
+                for bound, count in zip(self.buckets, series["buckets"]):
+                    lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {series["count"]}')
+                lines.append(f"{self.name}_sum{{{labels}}} {series['sum']}")
+                lines.append(f"{self.name}_count{{{labels}}} {series['count']}")
+
+        return "\n".join(lines)
+
+
+callback_duration = Histogram(
+    "dashboard_callback_duration_seconds",
+    "Duration of the callbacks by phase (compute or figure).",
+    DURATION_BUCKETS,
+)
+response_size = Histogram(
+    "dashboard_callback_response_bytes",
+    "Size of the serialized callback responses.",
+    SIZE_BUCKETS,
+)
+
+
+@contextlib.contextmanager
+def timed(phase: str):
+    """Measures the code inside the block as a phase of the running instrumented callback.
+
+    Args:
+        phase (str): The name of the phase, e.g. `figure`.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases = _phases.get()
+        if phases is not None:
+            phases[phase] = phases.get(phase, 0.0) + time.perf_counter() - start
+
+
+def instrument(func):
+    """Decorates a callback, so its duration and response size are measured."""
+    page = func.__module__.rpartition(".")[2]
+    labels = {"page": page, "callback": func.__name__}
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _phases.set({})
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            duration = time.perf_counter() - start
+            phases = _phases.get()
+            _phases.reset(token)
+
+            phases["compute"] = duration - sum(phases.values())
+            for phase, phase_duration in phases.items():
+                callback_duration.observe(phase_duration, phase=phase, **labels)
+
+            if has_request_context():
+                g.callback_labels = labels
+                g.callback_phases = phases
+
+    return wrapper
+
+
+def _before_request():
+    g.request_start = time.perf_counter()
+
+
+def _after_request(response: Response):
+    labels = g.pop("callback_labels", None)
+    if labels is None:
+        return response
+
+    phases = g.pop("callback_phases")
+    if not response.is_streamed:
+        response_size.observe(response.calculate_content_length() or 0, **labels)
+
+    timings = [f"{phase};dur={duration * 1000:.1f}" for phase, duration in phases.items()]
+    timings.append(f"total;dur={(time.perf_counter() - g.request_start) * 1000:.1f}")
+    response.headers.add("Server-Timing", ", ".join(timings))
+    return response
+
+
+def serve_metrics():
+    """Flask view returning all histograms in the Prometheus text format."""
+    body = "\n".join(histogram.expose() for histogram in (callback_duration, response_size))
+    return Response(f"{body}\n", mimetype="text/plain; version=0.0.4")
+
+
+def init_app(server):
+    """Adds the `/metrics` route and the `Server-Timing` header of callback responses to the Flask server.
+
+    Args:
+        server (flask.Flask): The server behind the Dash app.
+    """
+    server.before_request(_before_request)
+    server.after_request(_after_request)
+    server.add_url_rule("/metrics", "metrics", serve_metrics)
@@ -4,7 +4,9 @@ The job market page represents the situation on the job market in artificial int
 This page contains:
 
 1. Line chart showing the development of a different work modes, such as hybrid, onsite and remote work mode. Checkbox above the graph enables to show a different combinations.
-2. Sankey diagram showing the relationship between employment type and company size. Checkbox above the graph enables to show data for a specific year.
+2. Sankey diagram showing the relationship between employment type and company size.
+
+Slider above the graphs enables to show data for a range of years.
 
 Button below each graph shows information about what the graph expresses.
 """
@@ -13,11 +15,14 @@ Button below each graph shows information about what the graph expresses.
 import dash
 from dash.dependencies import Input, Output
 import dash_bootstrap_components as dbc
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from dash import dcc, html
-from src.utils import create_graph_button, get_info_text
+from dash import Patch, dcc
+from src import metrics
+from src.aggregates import DIMENSION_LABELS, build_sankey_flows, range_sankey_links
+from src.cache import figure_cache
+from src.dataset import current, register_preparer
+from src.figures import build_remote_ratio, empty_figure, sankey_figure
+from src.payloads import register_static_figure, register_static_graph, static_graph
+from src.utils import create_graph_button, create_info_text, create_year_slider, register_info_toggle
 
 dash.register_page(
     __name__,
@@ -26,235 +31,199 @@ dash.register_page(
     path="/job-market",
 )
 
-df = pd.read_csv("data/salaries.csv")
-
-remote_ratio_labels = {
-    0: "Onsite",
-    50: "Hybrid",
-    100: "Remote"
-}
+remote_ratio_labels = DIMENSION_LABELS["remote_ratio"]
 
-remote_ratio_counts = (
-    df.groupby(['work_year', 'remote_ratio'])
-    .size()
-    .reset_index(name='count')
-    .assign(label=lambda x: x['remote_ratio'].map(remote_ratio_labels))
-)
+remote_ratio_title = "Number of Employees Working Remotely by Remote Ratio"
 
-df_filtered = df.groupby(['work_year', 'company_size', 'experience_level']).size().reset_index(name='count')
-
-work_years = [{"label": str(year), "value": year} for year in sorted(df["work_year"].unique(), reverse=True)]
-
-# layout
-layout = dbc.Container([
-    dbc.Row([
-        dbc.Col([
-            dcc.Checklist(
-                id="remote-ratio-items",
-                options=[{"label": label, "value": label} for label in remote_ratio_labels.values()],
-                value=["Onsite"],
-                className="checklist-container",
-                labelStyle={
-                    "display": "flex",
-                    "align-items": "center",
-                    "font-size": "16px",
-                    "gap": "10px",
-                    "paddingTop": "5px"
-                },
-            ),
-            dcc.Loading(
-                id="loading-graph",
-                type="default",
-                children=dcc.Graph(id="remote-ratio-graph")
-            )
-        ], width=6),
-        dbc.Col([
-            dbc.Col([
-                dcc.Dropdown(
-                    id="work-years-dropdown",
-                    options=work_years,
-                    value=2020,
-                    placeholder="Select a work year",
-                    className="dropdown-item"
-                )
-            ], width=6),
-            dcc.Loading(
-                id="loading-sankey",
-                type="default",
-                children=dcc.Graph(id="sankey-diagram")
-            )
-        ], width=6),
-        dbc.Row([
-            dbc.Col([
-                create_graph_button("show-info-button-remote-ratio"),
-                html.Div(id="info-text-remote-ratio", style={'display': 'none'})
-            ], width=6),
-            dbc.Col([
-                create_graph_button("show-info-button-sankey"),
-                html.Div(id="info-text-sankey", style={'display': 'none'})
-            ], width=6)
-        ])
-    ], className="graphs-container")
-])
+# the work modes shown when the page is opened
+default_ratios = ["Onsite"]
 
 
-@dash.callback(
-    [Output("info-text-sankey", "children"),
-     Output("info-text-sankey", "style"),
-     Output("show-info-button-sankey", "children")],
-    Input("show-info-button-sankey", "n_clicks")
-)
-def display_text_sankey(n_clicks):
-    """Displays and hides the information about the graph
+def prepare_page_data(dataset):
+    """Computes the data presented on the page from the dataset.
 
     Args:
-        n_clicks (integer or None): The number of times the button has been clicked.
+        dataset (src.dataset.Dataset): The dataset to compute the data from.
 
     Returns:
-        tuple: A tuple containing:
-        - str: The information text to display (or an empty string if hidden).
-        - dict: The CSS style dict controlling visibility (`{'display': 'block'}` or `{'display': 'none'}`).
-        - str: The button text, either "Show Info" or "Hide Info".
+        dict: The remote-ratio line chart with the indices of its lines and its counts by year,
+              the cumulative Sankey diagram flows over the work years and the work years.
     """
-    if n_clicks is None:
-        n_clicks = 0
+    grid = dataset.grid
 
-    if n_clicks % 2 == 1:
-        return get_info_text("sankey"), {'display': 'block'}, "Hide Info"
-    else:
-        return "", {'display': 'none'}, "Show Info"
+    remote_ratio_counts = (
+        grid.groupby(level=['work_year', 'remote_ratio'])['count']
+        .sum()
+        .reset_index(name='count')
+        .assign(label=lambda x: x['remote_ratio'].map(remote_ratio_labels))
+    )
 
+    remote_ratio_graph = build_remote_ratio(remote_ratio_counts, default_ratios, remote_ratio_title, list(remote_ratio_labels.values()))
 
-@dash.callback(
-    [Output("info-text-remote-ratio", "children"),
-     Output("info-text-remote-ratio", "style"),
-     Output("show-info-button-remote-ratio", "children")],
-    Input("show-info-button-remote-ratio", "n_clicks")
-)
-def display_text_remote_ratio(n_clicks):
-    """Displays and hides the information about the graph
+    return {
+        "remote_ratio_graph": remote_ratio_graph,
+        "remote_ratio_traces": {trace.name: index for index, trace in enumerate(remote_ratio_graph.data)},
+        "remote_ratio_counts": remote_ratio_counts.pivot(index="work_year", columns="label", values="count").fillna(0),
+        "sankey_flows": build_sankey_flows(grid, "company_size", "experience_level"),
+        "work_years": sorted(grid.index.unique(level="work_year")),
+    }
 
-    Args:
-        n_clicks (integer or None): The number of times the button has been clicked.
 
-    Returns:
-        tuple: A tuple containing:
-        - str: The information text to display (or an empty string if hidden).
-        - dict: The CSS style dict controlling visibility (`{'display': 'block'}` or `{'display': 'none'}`).
-        - str: The button text, either "Show Info" or "Hide Info".
+register_preparer(__name__, prepare_page_data)
+register_static_figure("remote-ratio", lambda dataset: dataset.derive(__name__, prepare_page_data)["remote_ratio_graph"])
+
+
+def get_page_data(dataset=None):
+    """Returns the data presented on the page for the given or the current version of the dataset."""
+    return (dataset or current()).derive(__name__, prepare_page_data)
+
+
+def layout(**kwargs):
+    """Creates the layout of the page from the current version of the dataset.
+
+    The remote-ratio chart is not part of the layout, its figure is fetched after the page is rendered.
     """
-    if n_clicks is None:
-        n_clicks = 0
+    data = get_page_data()
 
-    if n_clicks % 2 == 1:
-        return get_info_text("remote_ratio"), {'display': 'block'}, "Hide Info"
-    else:
-        return "", {'display': 'none'}, "Show Info"
+    return dbc.Container([
+        dbc.Row([
+            dbc.Col([
+                create_year_slider("work-years-slider", data["work_years"])
+            ])
+        ]),
+        dbc.Row([
+            dbc.Col([
+                dcc.Checklist(
+                    id="remote-ratio-items",
+                    options=[{"label": label, "value": label} for label in remote_ratio_labels.values()],
+                    value=default_ratios,
+                    className="checklist-container",
+                    labelStyle={
+                        "display": "flex",
+                        "align-items": "center",
+                        "font-size": "16px",
+                        "gap": "10px",
+                        "paddingTop": "5px"
+                    },
+                ),
+                static_graph("remote-ratio-graph", "remote-ratio")
+            ], width=6),
+            dbc.Col([
+                dcc.Loading(
+                    id="loading-sankey",
+                    type="default",
+                    children=dcc.Graph(id="sankey-diagram")
+                )
+            ], width=6),
+            dbc.Row([
+                dbc.Col([
+                    create_graph_button("show-info-button-remote-ratio"),
+                    create_info_text("info-text-remote-ratio", "remote_ratio")
+                ], width=6),
+                dbc.Col([
+                    create_graph_button("show-info-button-sankey"),
+                    create_info_text("info-text-sankey", "sankey")
+                ], width=6)
+            ])
+        ], className="graphs-container")
+    ])
+
+
+register_static_graph("remote-ratio-graph")
+register_info_toggle("show-info-button-remote-ratio", "info-text-remote-ratio")
+register_info_toggle("show-info-button-sankey", "info-text-sankey")
 
 
 @dash.callback(
     Output("sankey-diagram", "figure"),
-    Input("work-years-dropdown", "value")
+    Input("work-years-slider", "value")
 )
-def update_sankey_graph(selected_work_year):
-    """Updates the Sankey diagram based on the selected work year.
+@metrics.instrument
+@figure_cache.memoize
+def update_sankey_graph(selected_work_years, dataset=None):
+    """Updates the Sankey diagram based on the selected range of work years.
+
+    The flows of the range are the difference of two cumulative matrices (see `build_sankey_flows`),
+    so any range costs the same as a single year.
 
     Args:
-        selected_work_year (int or None): The selected year from the dropdown menu.
-                                          If None, no year is selected.
+        selected_work_years (list of int or None): The first and the last selected year from the slider.
+                                                   If None, no year is selected.
+        dataset (src.dataset.Dataset or None): The dataset the diagram is computed from, passed by
+                                               `figure_cache.memoize`.
 
     Returns:
-        plotly.graph_objects.Figure: A Sankey diagram showing the flow between company size
-                                     and experience level for the selected year. If no year
-                                     is selected, a blank figure with a placeholder title
-                                     is returned.
+        dict: A Sankey diagram showing the flow between company size and experience level
+              for the selected years. If there is no data in the selected years, a blank
+              figure with a placeholder title is returned.
         """
-    if not selected_work_year:
-        return go.Figure().update_layout(title="No data selected")
-
-    filtered_data = df_filtered[df_filtered["work_year"] == selected_work_year].copy()
-
-    filtered_data.loc[:, 'company_size_label'] = filtered_data['company_size'].map({'S': 'Small', 'M': 'Medium', 'L': 'Large'})
+    if not selected_work_years:
+        return empty_figure("No data selected")
 
-    company_sizes = filtered_data['company_size_label'].unique()
-    experience_levels = filtered_data['experience_level'].unique()
+    links = range_sankey_links(get_page_data(dataset)["sankey_flows"], selected_work_years)
+    if not len(links["value"]):
+        return empty_figure("No data selected")
 
-    all_nodes = list(company_sizes) + list(experience_levels)
+    start, end = selected_work_years
+    years = str(start) if start == end else f"{start}–{end}"
 
-    source_indices = filtered_data['company_size_label'].apply(lambda x: all_nodes.index(x))
-    target_indices = filtered_data['experience_level'].apply(lambda x: all_nodes.index(x))
-
-    sankey_figure = go.Figure(go.Sankey(
-        node=dict(
-            pad=15,
-            thickness=20,
-            label=all_nodes,
-            color=["#1f77b4", "#D967B5", "#FF7F46", "#5DADE2", "#F8839E", "#FFA366", "#AE86DB"]
-
-        ),
-        link=dict(
-            source=source_indices,
-            target=target_indices,
-            value=filtered_data['count'],
-        )
-    ))
-
-    sankey_figure.update_layout(title=f"Company Size vs Experience Level Flow for {selected_work_year}")
-    return sankey_figure
+    with metrics.timed("figure"):
+        figure = sankey_figure(links, f"Company Size vs Experience Level Flow for {years}")
+    return figure
 
 
 @dash.callback(
-    Output("remote-ratio-graph", "figure"),
-    Input("remote-ratio-items", "value")
+    Output("remote-ratio-graph", "figure", allow_duplicate=True),
+    Input("remote-ratio-items", "value"),
+    Input("work-years-slider", "value"),
+    # the selection is applied again to the figure fetched after the page is rendered
+    Input("remote-ratio-graph-loaded", "data"),
+    prevent_initial_call=True
 )
-def update_graph(selected_ratios):
-    """Updates the line chart showing remote work trends based on selected work modes.
+@metrics.instrument
+def update_graph(selected_ratios, selected_work_years, loaded=None):
+    """Updates the line chart showing remote work trends based on selected work modes and years.
+
+    All work modes and years are already part of the figure created by `build_remote_ratio`,
+    so only the visibility of the individual lines, the ranges of the axes and the title are sent
+    to the browser. The y-axis is scaled to the largest count of the selected lines in the selected years.
 
     Args:
         selected_ratios (list of str): List of selected work modes (e.g., "Onsite",
                                        "Hybrid", "Remote") from the checklist.
                                        If empty, no data is selected.
+        selected_work_years (list of int or None): The first and the last selected year from the slider.
+                                                   If None, the x-axis is not changed.
+        loaded (int or None): When the figure of the chart was fetched, the figure of the default
+                              selection needs no update.
 
     Returns:
-        plotly.express.Figure: A line chart showing the number of employees working
-                               in each selected work mode over time. If no modes
-                               are selected, a blank chart with a placeholder title
-                               is returned.
+        dash.Patch: A partial update of the line chart showing only the selected work modes.
+                    If no modes are selected, all lines are hidden and a placeholder title
+                    is shown.
         """
-    if not selected_ratios:
-        return px.line(title="No data selected")
-
-    filtered_data = remote_ratio_counts[remote_ratio_counts['label'].isin(selected_ratios)]
-
-    color_map = {
-        "Onsite": "#1f77b4",
-        "Hybrid": "#D967B5",
-        "Remote": "#ff7f0e"
-    }
-
-    fig = px.line(
-        filtered_data,
-        x="work_year",
-        y="count",
-        color="label",
-        title="Number of Employees Working Remotely by Remote Ratio",
-        labels={
-            "work_year": "Year",
-            "count": "Number of Employees",
-            "label": "Work Mode"
-        },
-        markers=True,
-        color_discrete_map=color_map
-    )
-
-    fig.update_layout(
-        xaxis=dict(
-            tickmode="array",
-            tickvals=filtered_data["work_year"].unique(),
-            ticktext=[str(year) for year in filtered_data["work_year"].unique()],
-        ),
-        yaxis=dict(
-            rangemode="tozero"
-        )
-    )
-    return fig
+    selected_ratios = selected_ratios or []
+
+    data = get_page_data()
+    work_years = data["work_years"]
+    if loaded is not None and dash.ctx.triggered_id == "remote-ratio-graph-loaded" and (
+        selected_ratios == default_ratios and selected_work_years in (None, [work_years[0], work_years[-1]])
+    ):
+        return dash.no_update
+
+    with metrics.timed("figure"):
+        patched_figure = Patch()
+        for label, index in data["remote_ratio_traces"].items():
+            patched_figure["data"][index]["visible"] = label in selected_ratios
+
+        patched_figure["layout"]["title"]["text"] = remote_ratio_title if selected_ratios else "No data selected"
+        start, end = selected_work_years or (work_years[0], work_years[-1])
+        if selected_work_years:
+            patched_figure["layout"]["xaxis"]["range"] = [start - 0.5, end + 0.5]
+
+        counts = data["remote_ratio_counts"]
+        counts = counts.loc[start:end, counts.columns.intersection(selected_ratios)]
+        if counts.size:
+            # a margin above the highest point keeps its marker visible
+            patched_figure["layout"]["yaxis"]["range"] = [0, float(counts.to_numpy().max()) * 1.05 or 1]
+    return patched_figure
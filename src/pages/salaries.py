@@ -3,23 +3,45 @@ The salaries page demonstrates the salary ratio from a several points of view.
 
 This page contains two graphs:
 
-1. Bar graph showing the annual average salary for each year (from 2020 to 2024). Several controls above the graph can affect data presented in the graph to the user.
-2. Choropleth graph showing the annual average salary throughout years in the individual countries worldwide.
+1. Bar graph showing the annual average salary for each year of the range selected by the year slider. Several multi-select controls above the graph can affect data presented in the graph to the user.
+2. Choropleth graph showing the annual average salary throughout years in the individual countries worldwide. Clicking a country filters the bar graph and the cards to the country.
 
-Page also presents the average salary, the lowest salary and the highest salary for the specific country.
+Slider above the graphs enables to show both graphs for a range of years.
+
+Page also presents the average salary, the median salary, the 90th percentile of salaries, the lowest salary and the highest salary for the specific country.
 
 Button below each graph shows information about what the graph expresses.
 """
 
 
+import json
+import os
+
 import dash
 from dash.dependencies import Input, Output
 import dash_bootstrap_components as dbc
-import pandas as pd
-import plotly.express as px
-from dash import dcc, html
-import pycountry
-from src.utils import format_to_k, create_graph_button, get_info_text
+import plotly.io as pio
+from dash import Patch, dcc, html
+from src import metrics
+from src.aggregates import (
+    build_country_series,
+    build_prefix_sums,
+    build_salary_cube,
+    encode_table,
+    lookup_country_salary_per_year,
+    lookup_salary_per_year,
+    range_totals,
+    sketch_quantiles,
+    sketch_quantiles_by,
+)
+from src.bitmaps import BitmapIndex, ScanIndex, salary_per_year
+from src.cache import figure_cache
+from src.countries import resolve_countries
+from src.dataset import CHUNK_SIZE, current, register_preparer
+from src.export import export_links, register_export_links
+from src.figures import CHOROPLETH_TITLE, SALARY_TITLE, build_choropleth, salary_figure
+from src.payloads import register_static_figure, register_static_graph, static_graph
+from src.utils import format_to_k, create_graph_button, create_info_text, create_year_slider, register_info_toggle
 
 dash.register_page(
     __name__,
@@ -28,253 +50,488 @@ dash.register_page(
     path="/",
 )
 
-df = pd.read_csv("data/salaries.csv")
+# with DASHBOARD_CLIENTSIDE_FILTERS=1 the bar graph is filtered in the browser from an aggregate
+# table embedded in the page, so the filters cost no request; the job title filter is not available
+CLIENTSIDE_FILTERS = os.environ.get("DASHBOARD_CLIENTSIDE_FILTERS", "0") == "1"
+CLIENTSIDE_DIMS = ["experience_level", "employment_type", "company_size", "company_location"]
 
-average_salary_per_country = df.groupby("company_location")["salary_in_usd"].mean()
-min_average_salary_per_country = format_to_k(average_salary_per_country.min())
-max_average_salary_per_country = format_to_k(average_salary_per_country.max())
-average_salary = format_to_k(df["salary_in_usd"].sum() / df['salary_in_usd'].count())
+# the columns of the bitmap index in the order of the dropdowns filtering them
+BITMAP_COLUMNS = ["experience_level", "employment_type", "company_size", "job_title", "company_location"]
+FILTER_DROPDOWNS = ["experience-dropdown", "employment-dropdown", "company-dropdown", "job-title-dropdown", "location-dropdown"]
 
-choropleth_df = average_salary_per_country.reset_index()
-choropleth_df.columns = ["company_location", "avg_salary"]
+# the subtitles of the cards following the selected countries when no country is selected
+CARD_SUBTITLES = {
+    "average": "Average salary across all countries",
+    "median": "Half of the salaries are lower",
+    "percentile": "90 % of the salaries are lower",
+}
 
-min_salary_location = choropleth_df.loc[choropleth_df["avg_salary"] == choropleth_df["avg_salary"].min(), "company_location"].iloc[0]
-min_salary_location_fullname = pycountry.countries.get(alpha_2=min_salary_location).official_name
 
-max_salary_location = choropleth_df.loc[choropleth_df["avg_salary"] == choropleth_df["avg_salary"].max(), "company_location"].iloc[0]
-max_salary_location_fullname = pycountry.countries.get(alpha_2=max_salary_location).official_name
+def _build_index(df):
+    # streamed data are scanned in chunks, bitmaps of all their rows would not fit the chunk size
+    if CHUNK_SIZE:
+        return ScanIndex(df, BITMAP_COLUMNS, CHUNK_SIZE)
+    return BitmapIndex(df, BITMAP_COLUMNS)
 
-def convert_to_iso3(country_code):
-    try:
-        return pycountry.countries.lookup(country_code).alpha_3
-    except LookupError:
-        return None
 
+def prepare_page_data(dataset):
+    """Computes the data presented on the page from the dataset.
 
-choropleth_df["company_location"] = choropleth_df["company_location"].apply(convert_to_iso3)
-choropleth_df = choropleth_df.dropna(subset=["company_location"])
+    Args:
+        dataset (src.dataset.Dataset): The dataset to compute the data from.
 
-experience_levels = [{"label": i, "value": i} for i in df["experience_level"].unique()]
-employment_types = [{"label": i, "value": i} for i in df["employment_type"].unique()]
-company_sizes = [{"label": i, "value": i} for i in df["company_size"].unique()]
-job_titles = df["job_title"].unique()
+    Returns:
+        dict: The values shown in the cards, the data of the choropleth graph, the dropdown options,
+              the salary cube, the per-country series and the per-year bitmap indexes used by the bar graph,
+              the aggregates filtered in the browser, the per-country values of the cards and
+              the cumulative per-country sums over the years used by the choropleth graph.
+    """
+    grid = dataset.grid
+
+    salaries_per_country = grid.groupby(level="company_location")[["sum", "count"]].sum()
+    average_salary_per_country = salaries_per_country["sum"] / salaries_per_country["count"]
+
+    choropleth_df = average_salary_per_country.reset_index()
+    choropleth_df.columns = ["company_location", "avg_salary"]
+
+    min_salary_location = choropleth_df.loc[choropleth_df["avg_salary"] == choropleth_df["avg_salary"].min(), "company_location"].iloc[0]
+    max_salary_location = choropleth_df.loc[choropleth_df["avg_salary"] == choropleth_df["avg_salary"].max(), "company_location"].iloc[0]
+
+    countries = resolve_countries(choropleth_df["company_location"])
+    median_salary, percentile_salary = sketch_quantiles(dataset.sketches, [0.5, 0.9])
+
+    names = {code: countries.at[code, "official_name"] or code for code in choropleth_df["company_location"]}
+    locations = [{"label": name, "value": code} for code, name in names.items()]
+
+    quantiles_per_country = sketch_quantiles_by(dataset.sketches, [0.5, 0.9], by="company_location")
+    country_kpis = {
+        code: {
+            "name": names[code],
+            "average_salary": format_to_k(average_salary_per_country[code]),
+            "median_salary": format_to_k(quantiles_per_country[code][0]),
+            "percentile_salary": format_to_k(quantiles_per_country[code][1]),
+        }
+        for code in names
+    }
+
+    work_years = sorted(grid.index.unique(level="work_year"))
+    salary_cube = build_salary_cube(grid)
+    client_aggregates = None
+    if CLIENTSIDE_FILTERS:
+        figure = salary_figure(lookup_salary_per_year(salary_cube), [work_years[0], work_years[-1]])
+        client_aggregates = {
+            "table": encode_table(grid, CLIENTSIDE_DIMS),
+            "figure": json.loads(pio.to_json(figure, validate=False)),
+            "title": SALARY_TITLE,
+        }
+
+    country_prefix = build_prefix_sums(grid, ["company_location"])
+
+    choropleth_df["company_location"] = choropleth_df["company_location"].map(countries["iso3"])
+    choropleth_df = choropleth_df.dropna(subset=["company_location"])
+
+    return {
+        "average_salary": format_to_k(grid["sum"].sum() / grid["count"].sum()),
+        "median_salary": format_to_k(median_salary),
+        "percentile_salary": format_to_k(percentile_salary),
+        "min_average_salary_per_country": format_to_k(average_salary_per_country.min()),
+        "max_average_salary_per_country": format_to_k(average_salary_per_country.max()),
+        "min_salary_location_fullname": countries.at[min_salary_location, "official_name"] or min_salary_location,
+        "max_salary_location_fullname": countries.at[max_salary_location, "official_name"] or max_salary_location,
+        "choropleth_df": choropleth_df,
+        "country_codes": {iso3: code for code, iso3 in countries["iso3"].items() if iso3},
+        "country_kpis": country_kpis,
+        "country_series": build_country_series(grid),
+        "country_prefix": country_prefix,
+        "country_prefix_iso3": countries["iso3"].reindex(country_prefix["cells"]).fillna("").to_numpy(),
+        "work_years": work_years,
+        "sketches": dataset.sketches,
+        "experience_levels": [{"label": i, "value": i} for i in grid.index.unique(level="experience_level")],
+        "employment_types": [{"label": i, "value": i} for i in grid.index.unique(level="employment_type")],
+        "company_sizes": [{"label": i, "value": i} for i in grid.index.unique(level="company_size")],
+        "job_titles": sorted(set().union(*(
+            dataset.derive_partition("salaries job titles", year, lambda df: df["job_title"].unique())
+            for year in dataset.partitions
+        ))),
+        "locations": sorted(locations, key=lambda option: option["label"]),
+        "salary_cube": salary_cube,
+        "client_aggregates": client_aggregates,
+        # only the partitions changed by an append are indexed again
+        "bitmap_indexes": {
+            year: dataset.derive_partition("salaries bitmap index", year, _build_index)
+            for year in dataset.partitions
+        },
+    }
 
 
-def get_graph():
-    """Creates a choropleth graph showing the average annual salary in different countries worldwide"""
-    fig = px.choropleth(
-        choropleth_df,
-        locations="company_location",
-        color="avg_salary",
-        locationmode="ISO-3",
-        color_continuous_scale="Blues",
-        title="Average Salary by Country in USD"
-    )
+register_preparer(__name__, prepare_page_data)
 
-    fig.update_layout(
-        title_font=dict(
-            size=13,
-        )
-    )
 
-    return fig
+def get_page_data(dataset=None):
+    """Returns the data presented on the page for the given or the current version of the dataset."""
+    return (dataset or current()).derive(__name__, prepare_page_data)
+
+
+register_static_figure("choropleth", lambda dataset: build_choropleth(dataset.derive(__name__, prepare_page_data)["choropleth_df"]))
 
 
-# layout
-layout = dbc.Container([
-    dbc.Row([
-        dbc.Col(dbc.Card(
-            dbc.CardBody([
-                html.P("Average Salary", className="card-title"),
-                html.H4(f"$ {average_salary}", className="average-salary"),
-                html.P("Average salary across all countries", className="card-country-name")
-            ], className="card-body")
-        )),
-        dbc.Col(dbc.Card(
-            dbc.CardBody([
-                html.P("The Highest Salary", className="card-title"),
-                html.H4(f"$ {max_average_salary_per_country}", className="highest-salary"),
-                html.P(f"{max_salary_location_fullname}", className="card-country-name")
-            ], className="card-body")
-        )),
-        dbc.Col(dbc.Card(
-            dbc.CardBody([
-                html.P("The Lowest Salary", className="card-title"),
-                html.H4(f"$ {min_average_salary_per_country}", className="lowest-salary"),
-                html.P(f"{min_salary_location_fullname}", className="card-country-name")
-            ], className="card-body")
-        ))
-    ], className="cards-section"),
-    dbc.Row([
-        dbc.Col([
-            dbc.Row([
-                dbc.Col([
-                    dcc.Dropdown(
-                        options=experience_levels,
-                        placeholder="Select an experience level",
-                        className="dropdown-item",
-                        id="experience-dropdown"
-                    ),
-                    dcc.Dropdown(
-                        options=employment_types,
-                        placeholder="Select an employment type",
-                        className="dropdown-item",
-                        id="employment-dropdown"
-                    ),
-                ]),
-                dbc.Col([
-                    dcc.Dropdown(
-                        options=company_sizes,
-                        placeholder="Select a company size",
-                        className="dropdown-item",
-                        id="company-dropdown"
-                    ),
-                ]),
-            ], className="dropdown-container"),
-            dcc.Loading(
-                id="loading-graph",
-                type="default",
-                children=dcc.Graph(id="salary-graph")
-            ),
-        ], width=6),
-        dbc.Col([
-            dcc.Graph(
-                figure=get_graph(),
-                id="choropleth-graph"
-            ),
-        ], width=6),
-    ], className="graphs-container"),
-    dbc.Row([
-        dbc.Col([
-            create_graph_button("show-info-button"),
-            html.Div(id="info-text", style={'display': 'none'})
-        ], width=6),
-        dbc.Col([
-            create_graph_button("show-info-button-choropleth"),
-            html.Div(id="info-text-choropleth", style={'display': 'none'})
-        ], width=6)
+def layout(**kwargs):
+    """Creates the layout of the page from the current version of the dataset.
+
+    The choropleth graph is not part of the layout, its figure is fetched after the page is rendered.
+    """
+    data = get_page_data()
+
+    return dbc.Container([
+        dbc.Row([
+            dbc.Col(dbc.Card(
+                dbc.CardBody([
+                    html.P("Average Salary", className="card-title"),
+                    html.H4(f"$ {data['average_salary']}", className="average-salary", id="average-salary-value"),
+                    html.P(CARD_SUBTITLES["average"], className="card-country-name", id="average-salary-subtitle")
+                ], className="card-body")
+            )),
+            dbc.Col(dbc.Card(
+                dbc.CardBody([
+                    html.P("Median Salary", className="card-title"),
+                    html.H4(f"$ {data['median_salary']}", className="median-salary", id="median-salary-value"),
+                    html.P(CARD_SUBTITLES["median"], className="card-country-name", id="median-salary-subtitle")
+                ], className="card-body")
+            )),
+            dbc.Col(dbc.Card(
+                dbc.CardBody([
+                    html.P("90th Percentile", className="card-title"),
+                    html.H4(f"$ {data['percentile_salary']}", className="percentile-salary", id="percentile-salary-value"),
+                    html.P(CARD_SUBTITLES["percentile"], className="card-country-name", id="percentile-salary-subtitle")
+                ], className="card-body")
+            )),
+            dbc.Col(dbc.Card(
+                dbc.CardBody([
+                    html.P("The Highest Salary", className="card-title"),
+                    html.H4(f"$ {data['max_average_salary_per_country']}", className="highest-salary"),
+                    html.P(f"{data['max_salary_location_fullname']}", className="card-country-name")
+                ], className="card-body")
+            )),
+            dbc.Col(dbc.Card(
+                dbc.CardBody([
+                    html.P("The Lowest Salary", className="card-title"),
+                    html.H4(f"$ {data['min_average_salary_per_country']}", className="lowest-salary"),
+                    html.P(f"{data['min_salary_location_fullname']}", className="card-country-name")
+                ], className="card-body")
+            ))
+        ], className="cards-section"),
+        dbc.Row([
+            dbc.Col([
+                create_year_slider("salary-years-slider", data["work_years"])
+            ])
+        ]),
+        dbc.Row([
+            dbc.Col([
+                dbc.Row([
+                    dbc.Col([
+                        dcc.Dropdown(
+                            options=data["experience_levels"],
+                            placeholder="Select experience levels",
+                            multi=True,
+                            className="dropdown-item",
+                            id="experience-dropdown"
+                        ),
+                        dcc.Dropdown(
+                            options=data["employment_types"],
+                            placeholder="Select employment types",
+                            multi=True,
+                            className="dropdown-item",
+                            id="employment-dropdown"
+                        ),
+                    ]),
+                    dbc.Col([
+                        dcc.Dropdown(
+                            options=data["company_sizes"],
+                            placeholder="Select company sizes",
+                            multi=True,
+                            className="dropdown-item",
+                            id="company-dropdown"
+                        ),
+                        *([] if CLIENTSIDE_FILTERS else [dcc.Dropdown(
+                            options=data["job_titles"],
+                            placeholder="Select job titles",
+                            multi=True,
+                            className="dropdown-item",
+                            id="job-title-dropdown"
+                        )]),
+                        dcc.Dropdown(
+                            options=data["locations"],
+                            placeholder="Select company locations",
+                            multi=True,
+                            className="dropdown-item",
+                            id="location-dropdown"
+                        ),
+                    ]),
+                ], className="dropdown-container"),
+                dcc.Store(id="salary-aggregates", data=data["client_aggregates"]),
+                export_links("salary-export"),
+                dcc.Loading(
+                    id="loading-graph",
+                    type="default",
+                    children=dcc.Graph(id="salary-graph")
+                ),
+            ], width=6),
+            dbc.Col([
+                static_graph("choropleth-graph", "choropleth"),
+            ], width=6),
+        ], className="graphs-container"),
+        dbc.Row([
+            dbc.Col([
+                create_graph_button("show-info-button"),
+                create_info_text("info-text", "avg_salary")
+            ], width=6),
+            dbc.Col([
+                create_graph_button("show-info-button-choropleth"),
+                create_info_text("info-text-choropleth", "avg_salary_choropleth")
+            ], width=6)
+        ])
     ])
-])
 
 
-@dash.callback(
-    [Output("info-text-choropleth", "children"),
-     Output("info-text-choropleth", "style"),
-     Output("show-info-button-choropleth", "children")],
-    Input("show-info-button-choropleth", "n_clicks")
-)
-def display_text_choropleth(n_clicks):
-    """Displays and hides the information about the graph
+register_static_graph("choropleth-graph")
+register_export_links("salary-export", {
+    dropdown: column
+    for dropdown, column in zip(FILTER_DROPDOWNS, BITMAP_COLUMNS)
+    if not (CLIENTSIDE_FILTERS and dropdown == "job-title-dropdown")
+}, year_slider="salary-years-slider")
+register_info_toggle("show-info-button", "info-text")
+register_info_toggle("show-info-button-choropleth", "info-text-choropleth")
 
-    Args:
-        n_clicks (integer or None): The number of times the button has been clicked.
 
+@metrics.instrument
+@figure_cache.memoize
+def update_graph(
+    experience_levels, employment_types, company_sizes, job_titles=None, company_locations=None, work_years=None, dataset=None
+):
+    """Plots the average annual salary in the selected years in AI, ML and Data Science
+    
+    Args: 
+        experience_levels(list): Filters data frame according to experience level
+        employment_types(list): Filters data frame according to employment type
+        company_sizes(list): Filters data frame according to company size
+        job_titles(list): Filters data frame according to job title
+        company_locations(list): Filters data frame according to company location
+        work_years(list): The first and the last year shown in the graph, all years if None
+        dataset(Dataset): The dataset the graph is computed from, passed by `figure_cache.memoize`
+        
     Returns:
-        tuple: A tuple containing:
-        - str: The information text to display (or an empty string if hidden).
-        - dict: The CSS style dict controlling visibility (`{'display': 'block'}` or `{'display': 'none'}`).
-        - str: The button text, either "Show Info" or "Hide Info".
+        dict: The figure of the bar graph
     """
-    if n_clicks is None:
-        n_clicks = 0
 
-    if n_clicks % 2 == 1:
-        return get_info_text("avg_salary_choropleth"), {'display': 'block'}, "Hide Info"
+    data = get_page_data(dataset)
+
+    if company_locations and not (experience_levels or employment_types or company_sizes or job_titles):
+        average_salary_per_year = lookup_country_salary_per_year(data["country_series"], company_locations)
+    elif job_titles or company_locations:
+        # job titles and locations have too many values for the cube, the bitmap indexes of the
+        # selected years filter the rows
+        average_salary_per_year = salary_per_year(data["bitmap_indexes"], dict(zip(
+            BITMAP_COLUMNS,
+            (experience_levels, employment_types, company_sizes, job_titles, company_locations),
+        )), work_years)
     else:
-        return "", {'display': 'none'}, "Show Info"
+        average_salary_per_year = lookup_salary_per_year(data["salary_cube"], experience_levels, employment_types, company_sizes)
+
+    if work_years:
+        average_salary_per_year = average_salary_per_year[average_salary_per_year["work_year"].between(*work_years)]
+    else:
+        work_years = [data["work_years"][0], data["work_years"][-1]]
+
+    with metrics.timed("figure"):
+        fig = salary_figure(average_salary_per_year, work_years)
+
+    return fig
+
+
+if CLIENTSIDE_FILTERS:
+    # the same figure as `update_graph` returns, averaged from the sums and counts of the table
+    dash.clientside_callback(
+        """
+        function(experienceLevels, employmentTypes, companySizes, companyLocations, workYears, aggregates) {
+            if (!aggregates) {
+                return window.dash_clientside.no_update;
+            }
+            const table = aggregates.table;
+            const selections = {
+                experience_level: experienceLevels,
+                employment_type: employmentTypes,
+                company_size: companySizes,
+                company_location: companyLocations,
+            };
+
+            const filters = [];
+            for (const [dim, selected] of Object.entries(selections)) {
+                if (selected && selected.length) {
+                    const allowed = table.values[dim].map(value => selected.includes(value));
+                    filters.push([table.codes[dim], allowed]);
+                }
+            }
+
+            const [firstYear, lastYear] = workYears || [-Infinity, Infinity];
+            const totals = new Map();
+            for (let row = 0; row < table.work_year.length; row++) {
+                const year = table.work_year[row];
+                if (year >= firstYear && year <= lastYear && filters.every(([codes, allowed]) => allowed[codes[row]])) {
+                    const total = totals.get(table.work_year[row]) || [0, 0];
+                    total[0] += table.sum[row];
+                    total[1] += table.count[row];
+                    totals.set(table.work_year[row], total);
+                }
+            }
+
+            const years = Array.from(totals.keys()).sort((a, b) => a - b);
+            const figure = JSON.parse(JSON.stringify(aggregates.figure));
+            figure.data[0].x = years;
+            figure.data[0].y = years.map(year => totals.get(year)[0] / totals.get(year)[1]);
+            figure.layout.xaxis.tickvals = years;
+            figure.layout.xaxis.ticktext = years.map(String);
+            if (workYears) {
+                const [start, end] = workYears;
+                const range = start === end ? `in ${start}` : `from ${start} to ${end}`;
+                figure.layout.title.text = aggregates.title.replace("{years}", range);
+            }
+            return figure;
+        }
+        """,
+        Output("salary-graph", "figure"),
+        [
+            Input("experience-dropdown", "value"),
+            Input("employment-dropdown", "value"),
+            Input("company-dropdown", "value"),
+            Input("location-dropdown", "value"),
+            Input("salary-years-slider", "value"),
+            Input("salary-aggregates", "data")
+        ]
+    )
+else:
+    dash.callback(
+        Output("salary-graph", "figure"),
+        [
+            Input("experience-dropdown", "value"),
+            Input("employment-dropdown", "value"),
+            Input("company-dropdown", "value"),
+            Input("job-title-dropdown", "value"),
+            Input("location-dropdown", "value"),
+            Input("salary-years-slider", "value")
+        ]
+    )(update_graph)
 
 
 @dash.callback(
-    [Output("info-text", "children"),
-     Output("info-text", "style"),
-     Output("show-info-button", "children")],
-    Input("show-info-button", "n_clicks")
+    Output("choropleth-graph", "figure", allow_duplicate=True),
+    Input("salary-years-slider", "value"),
+    # the years are applied again to the figure fetched after the page is rendered
+    Input("choropleth-graph-loaded", "data"),
+    prevent_initial_call=True
 )
-def display_text(n_clicks):
-    """Displays and hides the information about the graph
+@metrics.instrument
+def update_choropleth(work_years, loaded=None):
+    """Updates the choropleth graph to the average salaries in the selected range of years.
+
+    The sums and counts of the range are the difference of two columns of the cumulative
+    per-country sums (see `build_prefix_sums`), so only the countries and their values are
+    sent to the browser.
 
     Args:
-        n_clicks (integer or None): The number of times the button has been clicked.
+        work_years (list of int): The first and the last selected year from the slider.
+        loaded (int or None): When the figure of the graph was fetched, the figure of all years
+                              needs no update.
 
     Returns:
-        tuple: A tuple containing:
-        - str: The information text to display (or an empty string if hidden).
-        - dict: The CSS style dict controlling visibility (`{'display': 'block'}` or `{'display': 'none'}`).
-        - str: The button text, either "Show Info" or "Hide Info".
+        dash.Patch: A partial update of the choropleth graph.
     """
-    if n_clicks is None:
-        n_clicks = 0
+    if not work_years:
+        return dash.no_update
 
-    if n_clicks % 2 == 1:
-        return get_info_text("avg_salary"), {'display': 'block'}, "Hide Info"
-    else:
-        return "", {'display': 'none'}, "Show Info"
+    data = get_page_data()
+    if loaded is not None and dash.ctx.triggered_id == "choropleth-graph-loaded" and (
+        work_years == [data["work_years"][0], data["work_years"][-1]]
+    ):
+        return dash.no_update
+    sums, counts = range_totals(data["country_prefix"], work_years)
+
+    with metrics.timed("figure"):
+        shown = (counts > 0) & data["country_prefix_iso3"].astype(bool)
+        start, end = work_years
+        years = str(start) if start == end else f"{start}–{end}"
+
+        patched_figure = Patch()
+        patched_figure["data"][0]["locations"] = data["country_prefix_iso3"][shown].tolist()
+        patched_figure["data"][0]["z"] = (sums[shown] / counts[shown]).tolist()
+        patched_figure["layout"]["title"]["text"] = f"{CHOROPLETH_TITLE} for {years}"
+    return patched_figure
 
 
 @dash.callback(
-    Output("salary-graph", "figure"),
-    [
-        Input("experience-dropdown", "value"),
-        Input("employment-dropdown", "value"),
-        Input("company-dropdown", "value")
-    ]
+    Output("location-dropdown", "value"),
+    Input("choropleth-graph", "clickData"),
+    prevent_initial_call=True
 )
-def update_graph(experience_levels, employment_types, company_sizes):
-    """Plots the average annual salary from 2020 to 2024 in AI, ML and Data Science
-    
-    Args: 
-        experience_levels(list): Filters data frame according to experience level
-        employment_types(list): Filters data frame according to employment type
-        company_sizes(list): Filters data frame according to company size
-        
+@metrics.instrument
+def select_country(click_data):
+    """Selects the country clicked in the choropleth graph in the location filter.
+
+    Args:
+        click_data (dict): The click data of the choropleth graph with the ISO-3 code of the country.
+
     Returns:
-        A plotly figure
+        list of str: The code of the clicked country.
     """
+    code = get_page_data()["country_codes"].get(click_data["points"][0].get("location"))
+    return [code] if code else dash.no_update
 
-    filtered_df = df.copy()
-
-    if experience_levels:
-        filtered_df = filtered_df[filtered_df["experience_level"] == experience_levels]
-    if employment_types:
-        filtered_df = filtered_df[filtered_df["employment_type"] == employment_types]
-    if company_sizes:
-        filtered_df = filtered_df[filtered_df["company_size"] == company_sizes]
-
-    average_salary_per_year = filtered_df.groupby("work_year")["salary_in_usd"].mean().reset_index()
-
-    fig = px.bar(
-        average_salary_per_year,
-        x="work_year",
-        y="salary_in_usd",
-        title="Average annual salary in AI, ML and Data Science from 2020 to 2024 worldwide",
-        labels={
-            "work_year": "Year",
-            "salary_in_usd": "Average salary in USD"
-        },
-    )
 
-    fig.update_traces(
-        marker_color="#1f77b4"
-    )
+@dash.callback(
+    [
+        Output("average-salary-value", "children"),
+        Output("average-salary-subtitle", "children"),
+        Output("median-salary-value", "children"),
+        Output("median-salary-subtitle", "children"),
+        Output("percentile-salary-value", "children"),
+        Output("percentile-salary-subtitle", "children")
+    ],
+    Input("location-dropdown", "value")
+)
+@metrics.instrument
+def update_cards(company_locations):
+    """Updates the average, median and 90th percentile cards to the selected countries.
 
-    fig.update_layout(
-        xaxis=dict(
-            tickmode="array",
-            tickvals=filtered_df["work_year"].unique(),
-            ticktext=[str(year) for year in filtered_df["work_year"].unique()],
-            title_font=dict(
-                size=13,
-            )
-        ),
-        yaxis=dict(
-            rangemode="tozero",
-            title_font=dict(
-                size=13,
-            )
-        ),
-        title_font=dict(
-            size=13,
-        )
-    )
+    A single country is looked up in the precomputed values of the countries, several countries
+    are combined from their per-country sums and quantile sketches.
 
-    return fig
+    Args:
+        company_locations (list of str): The selected country codes. If empty, the cards show
+                                         the values across all countries.
+
+    Returns:
+        tuple: The value and the subtitle of every card.
+    """
+    data = get_page_data()
+    codes = [code for code in company_locations or [] if code in data["country_kpis"]]
+
+    if not codes:
+        kpis = data
+        subtitles = CARD_SUBTITLES
+    elif len(codes) == 1:
+        kpis = data["country_kpis"][codes[0]]
+        subtitles = dict.fromkeys(CARD_SUBTITLES, kpis["name"])
+    else:
+        sums = sum(data["country_series"][code][["sum", "count"]].sum() for code in codes)
+        median_salary, percentile_salary = sketch_quantiles(data["sketches"], [0.5, 0.9], company_location=codes)
+        kpis = {
+            "average_salary": format_to_k(sums["sum"] / sums["count"]),
+            "median_salary": format_to_k(median_salary),
+            "percentile_salary": format_to_k(percentile_salary),
+        }
+        subtitles = dict.fromkeys(CARD_SUBTITLES, ", ".join(data["country_kpis"][code]["name"] for code in codes))
+
+    return tuple(
+        value
+        for card in CARD_SUBTITLES
+        for value in (f"$ {kpis[f'{card}_salary']}", subtitles[card])
+    )
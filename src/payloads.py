@@ -0,0 +1,159 @@
+"""
+Module serving static figures as pre-serialized and compressed JSON payloads.
+
+Static figures do not depend on any user input, e.g. the choropleth graph on the salaries page
+or the initial remote-ratio chart on the job market page.
+They are serialized once per dataset version (with `orjson` when it is installed), compressed with
+gzip (and brotli when the `brotli` package is installed) and served from the `/_figures/<name>`
+route with an ETag, so the browser revalidates them and gets a 304 response as long as the data
+do not change.
+
+The graphs showing a static figure are created with `static_graph` and their figure is fetched by
+a clientside callback after the page is rendered, so the figures are not part of the layout, the
+page and its cards are shown at once and a loading spinner is shown in place of each graph until
+its figure arrives.
+"""
+
+import gzip
+import hashlib
+
+import dash
+import plotly.io as pio
+from dash import dcc, html
+from dash.dependencies import Input, Output
+from flask import Response, abort, request
+
+from src.dataset import current, register_preparer
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ROUTE = "/_figures/"
+
+_builders = {}
+
+
+def _build_payload(name: str, dataset):
+    body = pio.to_json(_builders[name](dataset), validate=False, engine="auto").encode()
+
+    payload = {
+        "etag": hashlib.sha1(body).hexdigest(),
+        "identity": body,
+        "gzip": gzip.compress(body, mtime=0),
+    }
+    if brotli is not None:
+        payload["br"] = brotli.compress(body)
+    return payload
+
+
+def _payload_name(name: str):
+    return f"{__name__}.{name}"
+
+
+def register_static_figure(name: str, builder):
+    """Registers a static figure served by the `/_figures/<name>` route.
+
+    Args:
+        name (str): The name of the figure used in its URL.
+        builder (callable): A function creating the figure from a `src.dataset.Dataset`.
+    """
+    _builders[name] = builder
+    register_preparer(_payload_name(name), lambda dataset: _build_payload(name, dataset))
+
+
+def get_payload(name: str):
+    """Returns the serialized and compressed figure for the current version of the dataset.
+
+    Args:
+        name (str): The name of the figure.
+
+    Returns:
+        dict: The `etag` of the figure and its body for every supported content encoding
+              (`identity`, `gzip` and possibly `br`).
+    """
+    return current().derive(_payload_name(name), lambda dataset: _build_payload(name, dataset))
+
+
+def serve_figure(name: str):
+    """Flask view returning a static figure, compressed if the client accepts it."""
+    if name not in _builders:
+        abort(404)
+
+    payload = get_payload(name)
+
+    if request.if_none_match.contains_weak(payload["etag"]):
+        response = Response(status=304)
+    else:
+        encoding = next(
+            (encoding for encoding in ("br", "gzip") if encoding in payload and encoding in request.accept_encodings),
+            "identity",
+        )
+        response = Response(payload[encoding], mimetype="application/json")
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+
+    response.set_etag(payload["etag"])
+    response.headers["Cache-Control"] = "no-cache"
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def init_app(server):
+    """Adds the route serving the static figures to the Flask server.
+
+    Args:
+        server (flask.Flask): The server behind the Dash app.
+    """
+    server.add_url_rule(f"{ROUTE}<name>", "static_figure", serve_figure)
+
+
+def static_graph(id: str, name: str, **kwargs):
+    """Creates a graph whose figure is fetched from the static figure route after the page is rendered.
+
+    The graph needs a clientside callback registered with `register_static_graph`. It is wrapped in
+    a `dcc.Loading` component with the ID `loading-<id>`, which shows a spinner until the figure is fetched.
+    The fetched figure replaces the whole figure of the graph, so callbacks patching the figure
+    should also take the `data` of the store `<id>-loaded` as an input, which changes when the figure
+    is fetched, and apply the current state of their controls again.
+
+    Args:
+        id (str): The ID of the graph.
+        name (str): The name of the static figure.
+        **kwargs: Additional arguments passed to `dcc.Graph`.
+
+    Returns:
+        html.Div: A Div component containing the graph and the URL of its figure.
+    """
+    return html.Div([
+        dcc.Store(id=f"{id}-url", data=dash.get_relative_path(f"{ROUTE}{name}")),
+        dcc.Store(id=f"{id}-loaded"),
+        dcc.Loading(
+            id=f"loading-{id}",
+            type="default",
+            children=dcc.Graph(id=id, **kwargs),
+        ),
+    ])
+
+
+def register_static_graph(id: str):
+    """Registers a clientside callback fetching the figure of a graph created by `static_graph`.
+
+    Args:
+        id (str): The ID of the graph.
+    """
+    dash.clientside_callback(
+        """
+        async function(url) {
+            const response = await fetch(url, {credentials: "same-origin"});
+            if (!response.ok) {
+                return [window.dash_clientside.no_update, window.dash_clientside.no_update];
+            }
+            return [await response.json(), Date.now()];
+        }
+        """,
+        Output(id, "figure"),
+        Output(f"{id}-loaded", "data"),
+        Input(f"{id}-url", "data"),
+    )
@@ -0,0 +1,62 @@
+"""
+Module measuring the startup time of the dashboard.
+
+The durations of the individual startup steps (page imports, data loading and the preparation of
+the page data) are collected in `timings` and printed by `dashboard --profile-startup`.
+"""
+
+import contextlib
+import os
+import time
+from importlib.machinery import SourceFileLoader
+
+timings = {}
+
+
+@contextlib.contextmanager
+def timed(step: str):
+    """Measures the duration of the code inside the block and records it under the step name.
+
+    Args:
+        step (str): The name of the startup step.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[step] = time.perf_counter() - start
+
+
+@contextlib.contextmanager
+def page_imports(pages_folder: str):
+    """Measures the import time of every page module imported inside the block.
+
+    Args:
+        pages_folder (str): The folder containing the page modules.
+    """
+    pages_folder = os.path.abspath(pages_folder)
+    exec_module = SourceFileLoader.exec_module
+
+    def timed_exec_module(loader, module):
+        if not os.path.abspath(loader.path).startswith(pages_folder):
+            return exec_module(loader, module)
+        with timed(f"import {module.__name__}"):
+            return exec_module(loader, module)
+
+    SourceFileLoader.exec_module = timed_exec_module
+    try:
+        yield
+    finally:
+        SourceFileLoader.exec_module = exec_module
+
+
+def report():
+    """Formats the recorded timings as a table.
+
+    Returns:
+        str: One line per startup step with its duration in milliseconds.
+    """
+    width = max((len(step) for step in timings), default=0)
+    lines = [f"{step:<{width}}  {duration * 1000:10.1f} ms" for step, duration in timings.items()]
+    lines.append(f"{'total':<{width}}  {sum(timings.values()) * 1000:10.1f} ms")
+    return "\n".join(lines)
@@ -0,0 +1,79 @@
+"""
+Module running the dashboard in the production mode.
+
+The production mode uses `gunicorn` (install the `production` extra) with several worker processes,
+each running several threads. The data are loaded and prepared in the parent process before the
+workers are forked, so all workers share them copy-on-write and are ready as soon as they start.
+
+Sending `SIGHUP` to the parent process restarts the workers gracefully, i.e. the old workers finish
+the requests in progress (for at most `graceful_timeout` seconds) while the new ones already accept
+new requests.
+"""
+
+import os
+
+from src import dataset
+
+
+def parse_bind(bind: str):
+    """Splits a bind address into the host and the port.
+
+    Args:
+        bind (str): An address in the `HOST:PORT` format.
+
+    Returns:
+        tuple: The host (str) and the port (int).
+    """
+    host, _, port = bind.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def post_fork(server, worker):
+    """Starts the background threads of a worker, threads of the parent do not survive the fork."""
+    if dataset.WATCH_INTERVAL > 0:
+        dataset.watch()
+
+
+def run_production(
+    flask_server,
+    bind: str = "127.0.0.1:8050",
+    workers: int = os.cpu_count() or 1,
+    threads: int = 4,
+    graceful_timeout: int = 30,
+    max_requests: int = 0,
+):
+    """Runs the Flask server behind the Dash app with gunicorn.
+
+    Args:
+        flask_server (flask.Flask): The server behind the Dash app.
+        bind (str): The address to listen on in the `HOST:PORT` format.
+        workers (int): The number of worker processes.
+        threads (int): The number of threads of every worker process.
+        graceful_timeout (int): The number of seconds workers have to finish their requests on restart.
+        max_requests (int): The number of requests after which a worker is gracefully restarted,
+                            0 disables the restarts.
+    """
+    from gunicorn.app.base import BaseApplication
+
+    options = {
+        "bind": bind,
+        "workers": workers,
+        "threads": threads,
+        "worker_class": "gthread" if threads > 1 else "sync",
+        "graceful_timeout": graceful_timeout,
+        "max_requests": max_requests,
+        "max_requests_jitter": max_requests // 10,
+        "preload_app": True,
+        "post_fork": post_fork,
+    }
+
+    class DashboardApplication(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return flask_server
+
+    dataset.prepare(dataset.current())
+    DashboardApplication().run()
@@ -0,0 +1,523 @@
+"""
+Module storing the dataset and its aggregates as a memory-mapped columnar snapshot.
+
+A snapshot is a directory with one file of fixed-width values per column. Categorical and text
+columns are stored as integer codes, their categories (dictionaries) are kept in `meta.json`
+together with the dtypes and the version of the data. The files are opened with memory mapping,
+so all worker processes share the same pages of the operating system cache and opening
+a snapshot costs almost nothing regardless of the data size.
+
+The data and their aggregates are partitioned by `work_year`: every year has its own subdirectory
+with its columns, grid and sketches, so a query of one year never reads the files of other years.
+Years that were published do not change, so when rows are appended (see `append_snapshot`) only
+the partitions of the years of the new rows are written, the others are hard-linked from the
+previous snapshot.
+
+Every snapshot is written to its own subdirectory named by the data version and the `CURRENT`
+file points to the latest one, so a snapshot can be rebuilt while the app is reading the old one.
+
+The snapshot is built from the CSV file as a separate step, with `--chunk-size` the file is read
+in chunks of that many rows, so files larger than the memory can be ingested:
+
+    python -m src.snapshot [--csv data/salaries.csv] [--out data/snapshot] [--chunk-size 1000000]
+"""
+
+import argparse
+import base64
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.aggregates import build_grid, build_sketches, merge_grids, merge_sketches
+
+META_FILE = "meta.json"
+CURRENT_FILE = "CURRENT"
+
+PARTITION_COLUMN = "work_year"
+
+# number of codes rewritten at once when a column written by `FrameWriter` is narrowed
+NARROW_BLOCK_SIZE = 1_000_000
+
+# seconds after which unfinished snapshots (e.g. of a crashed process) and replaced ones are removed
+STALE_SNAPSHOT_AGE = 24 * 60 * 60
+
+
+def _write_frame(df: pd.DataFrame, directory: str):
+    os.makedirs(directory)
+    columns = {}
+
+    for name, column in df.items():
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            categorical = column.cat
+        elif column.dtype.kind in "biuf":
+            column.to_numpy().tofile(os.path.join(directory, f"{name}.bin"))
+            columns[name] = {"dtype": column.dtype.str}
+            continue
+        else:
+            categorical = column.astype("category").cat
+
+        codes = categorical.codes.to_numpy()
+        codes.tofile(os.path.join(directory, f"{name}.bin"))
+        columns[name] = {"dtype": codes.dtype.str, "categories": categorical.categories.tolist()}
+
+    return {"rows": len(df), "columns": columns}
+
+
+def _read_frame(directory: str, meta: dict, dtypes: dict = None):
+    columns = {}
+    # the partitions mostly repeat the same categories, their dtypes are created only once
+    dtypes = {} if dtypes is None else dtypes
+
+    for name, column in meta["columns"].items():
+        path = os.path.join(directory, f"{name}.bin")
+        values = np.memmap(path, dtype=column["dtype"], mode="r") if meta["rows"] else np.empty(0, column["dtype"])
+
+        if "categories" in column:
+            key = (name, tuple(column["categories"]))
+            if key not in dtypes:
+                dtypes[key] = pd.CategoricalDtype(column["categories"])
+            values = pd.Categorical.from_codes(values, dtype=dtypes[key], validate=False)
+        columns[name] = values
+
+    return pd.DataFrame(columns, copy=False)
+
+
+class FrameWriter:
+    """Writes a frame to a snapshot directory chunk by chunk, so it never has to be in memory whole.
+
+    Categorical and text columns are stored as 32-bit codes into categories collected over all
+    the chunks. When the frame is closed, the codes are narrowed to the width pandas uses for the
+    number of categories, so the columns can be memory-mapped without a copy.
+
+    Args:
+        directory (str): The directory of the frame, it must not exist.
+    """
+
+    def __init__(self, directory: str):
+        os.makedirs(directory)
+        self.directory = directory
+        self.rows = 0
+        self._files = {}
+        self._columns = {}
+        self._categories = {}
+
+    def _write(self, name: str, values: np.ndarray):
+        if name not in self._files:
+            self._files[name] = open(os.path.join(self.directory, f"{name}.bin"), "wb")
+            self._columns[name] = {"dtype": values.dtype.str}
+        values.tofile(self._files[name])
+
+    def append(self, df: pd.DataFrame):
+        """Appends the rows of a chunk.
+
+        Args:
+            df (pd.DataFrame): The chunk, all chunks must have the same columns and numeric dtypes.
+        """
+        for name, column in df.items():
+            if column.dtype.kind in "biuf":
+                self._write(name, column.to_numpy())
+                continue
+
+            categorical = column.cat if isinstance(column.dtype, pd.CategoricalDtype) else column.astype("category").cat
+            categories = self._categories.setdefault(name, {})
+            mapping = np.array(
+                [categories.setdefault(value, len(categories)) for value in categorical.categories.tolist()],
+                dtype=np.int32,
+            )
+            codes = categorical.codes.to_numpy()
+            self._write(name, np.where(codes >= 0, mapping[codes] if len(mapping) else -1, -1).astype(np.int32))
+
+        self.rows += len(df)
+
+    def close(self):
+        """Closes the files of the columns.
+
+        Returns:
+            dict: The description of the frame stored in the snapshot metadata.
+        """
+        for file in self._files.values():
+            file.close()
+
+        for name, categories in self._categories.items():
+            self._columns[name]["categories"] = list(categories)
+            self._narrow_codes(name, categories)
+        return {"rows": self.rows, "columns": self._columns}
+
+    def _narrow_codes(self, name: str, categories: dict):
+        dtype = pd.Categorical.from_codes(np.empty(0, np.int32), categories=list(categories)).codes.dtype
+        if dtype == np.int32:
+            return
+
+        path = os.path.join(self.directory, f"{name}.bin")
+        if self.rows:
+            codes = np.memmap(path, dtype=np.int32, mode="r")
+            with open(f"{path}.tmp", "wb") as f:
+                for start in range(0, len(codes), NARROW_BLOCK_SIZE):
+                    codes[start:start + NARROW_BLOCK_SIZE].astype(dtype).tofile(f)
+            del codes
+            os.replace(f"{path}.tmp", path)
+        self._columns[name]["dtype"] = dtype.str
+
+
+def split_partitions(df: pd.DataFrame):
+    """Splits the salaries data into partitions by `PARTITION_COLUMN`.
+
+    Args:
+        df (pd.DataFrame): The salaries data.
+
+    Returns:
+        dict: A dictionary mapping a year to the rows of the year, ordered by the year.
+    """
+    return {int(year): rows.reset_index(drop=True) for year, rows in df.groupby(PARTITION_COLUMN, sort=True)}
+
+
+def _partition_of(frame: pd.DataFrame, year: int):
+    return frame[frame.index.get_level_values(PARTITION_COLUMN) == year]
+
+
+def _partition_path(target: str, year):
+    return os.path.join(target, "partitions", str(year))
+
+
+def _begin_snapshot(directory: str, version: str):
+    tmp_target = f"{os.path.join(directory, version)}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_target, ignore_errors=True)
+    return tmp_target
+
+
+def _commit_snapshot(directory: str, version: str, tmp_target: str, meta: dict):
+    target = os.path.join(directory, version)
+    previous_version = read_snapshot_version(directory)
+
+    with open(os.path.join(tmp_target, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(tmp_target, target)
+
+    current_tmp = f"{os.path.join(directory, CURRENT_FILE)}.{os.getpid()}.tmp"
+    with open(current_tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(current_tmp, os.path.join(directory, CURRENT_FILE))
+
+    # the replaced snapshot is removed, the snapshots being written by other processes are kept
+    if previous_version not in (None, version):
+        shutil.rmtree(os.path.join(directory, previous_version), ignore_errors=True)
+    _remove_stale(directory, keep=version)
+
+
+def _remove_stale(directory: str, keep: str):
+    """Removes snapshots left behind by crashed or concurrent writers once they are old enough."""
+    now = time.time()
+
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name == keep or not os.path.isdir(path):
+            continue
+        try:
+            if now - os.path.getmtime(path) > STALE_SNAPSHOT_AGE:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass
+
+
+def _snapshot_meta(version: str, size: int, tail: bytes, partitions: dict):
+    return {
+        "version": version,
+        "size": size,
+        "tail": base64.b64encode(tail).decode(),
+        "partitions": {str(year): partition for year, partition in sorted(partitions.items())},
+    }
+
+
+def _write_aggregates(tmp_target: str, grid: pd.DataFrame, sketches: pd.DataFrame):
+    return {
+        "grid": _write_frame(grid.reset_index(), os.path.join(tmp_target, "grid")),
+        "grid_index": list(grid.index.names),
+        "sketches": _write_frame(sketches.reset_index(), os.path.join(tmp_target, "sketches")),
+        "sketches_index": list(sketches.index.names),
+    }
+
+
+def _index_aggregate(frame: pd.DataFrame, index: list):
+    # the aggregates are small, their index holds plain values like the ones created in `src.aggregates`
+    for column_name, column in frame.items():
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            frame[column_name] = column.astype(column.cat.categories.dtype)
+    return frame.set_index(index)
+
+
+def _read_aggregate(target: str, meta: dict, name: str):
+    if name not in meta:
+        return None
+    return _index_aggregate(_read_frame(os.path.join(target, name), meta[name]), meta[f"{name}_index"])
+
+
+def _write_partition(tmp_target: str, year: int, df: pd.DataFrame, grid: pd.DataFrame, sketches: pd.DataFrame):
+    directory = _partition_path(tmp_target, year)
+    return {"data": _write_frame(df, os.path.join(directory, "data")), **_write_aggregates(directory, grid, sketches)}
+
+
+def _link_partition(target: str, tmp_target: str, year):
+    # the files of a snapshot are never modified, so the new snapshot can share them
+    try:
+        shutil.copytree(_partition_path(target, year), _partition_path(tmp_target, year), copy_function=os.link)
+    except OSError:
+        shutil.rmtree(_partition_path(tmp_target, year), ignore_errors=True)
+        shutil.copytree(_partition_path(target, year), _partition_path(tmp_target, year))
+
+
+def write_snapshot(
+    directory: str,
+    partitions: dict,
+    grid: pd.DataFrame,
+    sketches: pd.DataFrame,
+    version: str,
+    size: int,
+    tail: bytes,
+):
+    """Writes the dataset and its aggregates as a new snapshot.
+
+    Args:
+        directory (str): The snapshot directory.
+        partitions (dict): The salaries data by year, see `split_partitions`.
+        grid (pd.DataFrame): The grid created by `src.aggregates.build_grid`.
+        sketches (pd.DataFrame): The sketches created by `src.aggregates.build_sketches`.
+        version (str): The version of the data.
+        size (int): The number of bytes of the CSV file the data were loaded from.
+        tail (bytes): The last bytes of the CSV file the data were loaded from.
+    """
+    tmp_target = _begin_snapshot(directory, version)
+
+    meta = _snapshot_meta(version, size, tail, {
+        year: _write_partition(tmp_target, year, df, _partition_of(grid, year), _partition_of(sketches, year))
+        for year, df in partitions.items()
+    })
+    _commit_snapshot(directory, version, tmp_target, meta)
+
+
+def stream_snapshot(directory: str, chunks, version: str, size: int, tail: bytes):
+    """Writes a new snapshot from the salaries data read in chunks.
+
+    The rows of every chunk are appended to the files of their partitions and folded into the
+    aggregates of the partitions, so the memory needed is given by the size of the chunks and
+    not by the size of the data.
+
+    Args:
+        directory (str): The snapshot directory.
+        chunks (iterable of pd.DataFrame): The chunks of the salaries data.
+        version (str): The version of the data.
+        size (int): The number of bytes of the CSV file the data are read from.
+        tail (bytes): The last bytes of the CSV file the data are read from.
+    """
+    tmp_target = _begin_snapshot(directory, version)
+    writers, grids, sketches = {}, {}, {}
+
+    try:
+        for chunk in chunks:
+            for year, rows in split_partitions(chunk).items():
+                if year not in writers:
+                    writers[year] = FrameWriter(os.path.join(_partition_path(tmp_target, year), "data"))
+                writers[year].append(rows)
+
+                rows_grid, rows_sketches = build_grid(rows), build_sketches(rows)
+                grids[year] = merge_grids(grids[year], rows_grid) if year in grids else rows_grid
+                sketches[year] = merge_sketches(sketches[year], rows_sketches) if year in sketches else rows_sketches
+    finally:
+        data = {year: writer.close() for year, writer in writers.items()}
+
+    meta = _snapshot_meta(version, size, tail, {
+        year: {"data": data[year], **_write_aggregates(_partition_path(tmp_target, year), grids[year], sketches[year])}
+        for year in writers
+    })
+    _commit_snapshot(directory, version, tmp_target, meta)
+
+
+def _read_meta(directory: str):
+    try:
+        with open(os.path.join(directory, CURRENT_FILE), encoding="utf-8") as f:
+            target = os.path.join(directory, f.read().strip())
+        with open(os.path.join(target, META_FILE), encoding="utf-8") as f:
+            return target, json.load(f)
+    except (OSError, ValueError):
+        return None, None
+
+
+def read_snapshot_version(directory: str):
+    """Returns the version of the data in the current snapshot without opening it.
+
+    Args:
+        directory (str): The snapshot directory.
+
+    Returns:
+        str or None: The version of the current snapshot, None if there is no snapshot.
+    """
+    try:
+        with open(os.path.join(directory, CURRENT_FILE), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _read_partition(target: str, year, meta: dict):
+    directory = _partition_path(target, year)
+    return (
+        _read_frame(os.path.join(directory, "data"), meta["data"]),
+        _read_aggregate(directory, meta, "grid"),
+        _read_aggregate(directory, meta, "sketches"),
+    )
+
+
+def _read_partitioned_aggregate(target: str, partitions: dict, name: str):
+    # the partitions are concatenated first, so the values are converted and indexed only once
+    dtypes = {}
+    frames = [
+        _read_frame(os.path.join(_partition_path(target, year), name), meta[name], dtypes)
+        for year, meta in partitions.items()
+    ]
+    return _index_aggregate(pd.concat(frames, ignore_index=True), next(iter(partitions.values()))[f"{name}_index"])
+
+
+def append_snapshot(
+    directory: str,
+    previous_version: str,
+    chunks,
+    version: str,
+    size: int,
+    tail: bytes,
+    chunk_size: int,
+):
+    """Writes a new snapshot with rows appended to the data of the current one.
+
+    Only the partitions of the years of the new rows are written and their aggregates updated,
+    the other partitions are hard-linked from the current snapshot without being read. The rows
+    of a changed partition are copied in slices of `chunk_size` rows and the new rows are read
+    chunk by chunk, so neither has to be in memory whole.
+
+    Args:
+        directory (str): The snapshot directory.
+        previous_version (str): The version of the data the rows are appended to.
+        chunks (iterable of pd.DataFrame): The chunks of the appended rows, read only if needed.
+        version (str): The version of the data with the appended rows.
+        size (int): The number of bytes of the CSV file the data are read from.
+        tail (bytes): The last bytes of the CSV file the data are read from.
+        chunk_size (int): The number of rows of a changed partition copied at once.
+
+    Returns:
+        bool: Whether the snapshot holds the appended rows, False if the current snapshot is not
+              partitioned or holds another version of the data.
+    """
+    target, meta = _read_meta(directory)
+    if meta is not None and meta["version"] == version:
+        # another process has already appended the rows
+        return True
+    if meta is None or meta["version"] != previous_version or "partitions" not in meta:
+        return False
+
+    tmp_target = _begin_snapshot(directory, version)
+    partitions = dict(meta["partitions"])
+    writers, grids, sketches = {}, {}, {}
+
+    try:
+        for chunk in chunks:
+            for year, rows in split_partitions(chunk).items():
+                rows_grid, rows_sketches = build_grid(rows), build_sketches(rows)
+
+                if year not in writers:
+                    writers[year] = FrameWriter(os.path.join(_partition_path(tmp_target, year), "data"))
+                    if str(year) in partitions:
+                        df, grids[year], sketches[year] = _read_partition(target, year, partitions[str(year)])
+                        for start in range(0, len(df), chunk_size):
+                            writers[year].append(df.iloc[start:start + chunk_size])
+                        del df
+
+                writers[year].append(rows)
+                grids[year] = merge_grids(grids[year], rows_grid) if year in grids else rows_grid
+                sketches[year] = merge_sketches(sketches[year], rows_sketches) if year in sketches else rows_sketches
+    finally:
+        data = {year: writer.close() for year, writer in writers.items()}
+
+    for year in writers:
+        partitions[str(year)] = {
+            "data": data[year],
+            **_write_aggregates(_partition_path(tmp_target, year), grids[year], sketches[year]),
+        }
+
+    for year in partitions:
+        if not os.path.exists(_partition_path(tmp_target, year)):
+            _link_partition(target, tmp_target, year)
+
+    _commit_snapshot(directory, version, tmp_target, _snapshot_meta(version, size, tail, partitions))
+    return True
+
+
+def read_snapshot(directory: str):
+    """Opens the current snapshot with memory mapping.
+
+    Args:
+        directory (str): The snapshot directory.
+
+    Returns:
+        dict: The `partitions` of the data by year, the `grid`, the `sketches` (None in snapshots
+              written without them), the `version`, the `size` and the `tail` of the snapshot or
+              None if there is no snapshot in the directory.
+    """
+    target, meta = _read_meta(directory)
+    if meta is None:
+        return None
+
+    if "partitions" in meta:
+        dtypes = {}
+        partitions = {
+            int(year): _read_frame(os.path.join(_partition_path(target, year), "data"), partition["data"], dtypes)
+            for year, partition in meta["partitions"].items()
+        }
+        grid = _read_partitioned_aggregate(target, meta["partitions"], "grid")
+        sketches = _read_partitioned_aggregate(target, meta["partitions"], "sketches")
+    else:
+        # snapshots written before the data were partitioned
+        partitions = split_partitions(_read_frame(os.path.join(target, "data"), meta["data"]))
+        grid = _read_aggregate(target, meta, "grid")
+        sketches = _read_aggregate(target, meta, "sketches")
+
+    return {
+        "partitions": partitions,
+        "grid": grid,
+        "sketches": sketches,
+        "version": meta["version"],
+        "size": meta["size"],
+        "tail": base64.b64decode(meta["tail"]),
+    }
+
+
+def main():
+    """Builds the snapshot of the dataset from the CSV file."""
+    from src.dataset import CHUNK_SIZE, DATA_PATH, SNAPSHOT_DIR, load_dataset, stream_dataset
+
+    parser = argparse.ArgumentParser(description="Builds the memory-mapped snapshot of the salaries dataset.")
+    parser.add_argument("--csv", default=DATA_PATH, help="path to the CSV file (default: %(default)s)")
+    parser.add_argument("--out", default=SNAPSHOT_DIR, help="the snapshot directory (default: %(default)s)")
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=CHUNK_SIZE,
+        help="read the CSV file in chunks of this many rows, 0 reads it at once (default: %(default)s)",
+    )
+    args = parser.parse_args()
+
+    if args.chunk_size:
+        dataset = stream_dataset(args.csv, args.out, args.chunk_size)
+    else:
+        dataset = load_dataset(args.csv, use_snapshot=False)
+        write_snapshot(
+            args.out, dataset.partitions, dataset.grid, dataset.sketches, dataset.version, dataset.size, dataset.tail
+        )
+    print(f"Snapshot {dataset.version} of {dataset.rows} rows written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,10 @@
 Module containing helper functions
 """
 
+import dash
 import dash_bootstrap_components as dbc
+from dash import dcc, html
+from dash.dependencies import Input, Output
 
 
 def format_to_k(num):
@@ -33,6 +36,63 @@ def create_graph_button(id: str):
     return dbc.Button("Show info", id=id, color="primary", className="info-button")
 
 
+def create_info_text(id: str, info_type: str):
+    """Creates a hidden container holding the information text about a graph.
+
+        Args:
+            id (str): The ID to assign to the container.
+            info_type (str): The type of information, see `get_info_text`.
+
+        Returns:
+            html.Div: A hidden Div component containing the information text.
+    """
+    return html.Div(get_info_text(info_type), id=id, style={"display": "none"})
+
+
+def create_year_slider(id: str, years: list):
+    """Creates a slider selecting a range of work years, by default all of them.
+
+        Args:
+            id (str): The ID to assign to the slider.
+            years (list of int): The sorted work years present in the data.
+
+        Returns:
+            dcc.RangeSlider: A Dash RangeSlider component with a mark for every year.
+    """
+    return dcc.RangeSlider(
+        id=id,
+        min=years[0],
+        max=years[-1],
+        step=1,
+        value=[years[0], years[-1]],
+        marks={int(year): str(year) for year in years},
+        className="year-slider",
+    )
+
+
+def register_info_toggle(button_id: str, text_id: str):
+    """Registers a clientside callback displaying and hiding the information text about a graph.
+
+    The text is part of the page layout (see `create_info_text`), so toggling it is done in the
+    browser and never reaches the server.
+
+        Args:
+            button_id (str): The ID of the button created by `create_graph_button`.
+            text_id (str): The ID of the container created by `create_info_text`.
+    """
+    dash.clientside_callback(
+        """
+        function(n_clicks) {
+            const shown = (n_clicks || 0) % 2 === 1;
+            return [{"display": shown ? "block" : "none"}, shown ? "Hide Info" : "Show Info"];
+        }
+        """,
+        Output(text_id, "style"),
+        Output(button_id, "children"),
+        Input(button_id, "n_clicks"),
+    )
+
+
 def get_info_text(info_type: str):
     """Returns information text based on the specified type.
 
@@ -46,7 +106,7 @@ def get_info_text(info_type: str):
     """
     info_texts = {
         'remote_ratio': (
-            'The number of employees working remotely over time from 2020 to 2024, '
+            'The number of employees working remotely over time in the selected years, '
             'either in a hybrid model or on-site, based on the remote ratio.'
         ),
         'sankey': (
@@ -55,7 +115,7 @@ def get_info_text(info_type: str):
             'a particular size and number of employees.'
         ),
         'avg_salary': (
-            'A bar chart displaying the average annual salary from 2020 to 2024 in USD. '
+            'A bar chart displaying the average annual salary in the selected years in USD. '
             'The data in the chart can be adjusted based on the selectors defined above the chart.'
         ),
         "avg_salary_choropleth": (
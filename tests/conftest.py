@@ -0,0 +1,43 @@
+"""
+Shared setup of the tests.
+
+The data paths of `src.dataset` are read from the environment when the module is imported, so
+they are pointed to a small generated dataset in a temporary directory before any test imports it.
+"""
+
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+DATA_DIR = tempfile.mkdtemp(prefix="dashboard-tests-")
+DATA_PATH = os.path.join(DATA_DIR, "salaries.csv")
+
+os.environ["DASHBOARD_DATA"] = DATA_PATH
+os.environ["DASHBOARD_CACHE_DIR"] = os.path.join(DATA_DIR, ".cache")
+os.environ["DASHBOARD_FIGURE_CACHE"] = "memory"
+
+
+def generate_salaries(rows: int, seed: int = 0):
+    """Generates salaries data with the columns of `data/salaries.csv`."""
+    rng = np.random.default_rng(seed)
+    countries = rng.choice(["US", "GB", "CA", "DE", "IN", "FR", "ES", "BR", "JP", "PL"], rows)
+    salaries = rng.integers(20_000, 300_000, rows)
+
+    return pd.DataFrame({
+        "work_year": rng.choice([2020, 2021, 2022, 2023, 2024], rows),
+        "experience_level": rng.choice(["EN", "MI", "SE", "EX"], rows),
+        "employment_type": rng.choice(["FT", "PT", "CT", "FL"], rows),
+        "job_title": rng.choice(["Data Scientist", "Data Engineer", "Data Analyst", "ML Engineer"], rows),
+        "salary": salaries,
+        "salary_currency": "USD",
+        "salary_in_usd": salaries,
+        "employee_residence": countries,
+        "remote_ratio": rng.choice([0, 50, 100], rows),
+        "company_location": countries,
+        "company_size": rng.choice(["S", "M", "L"], rows),
+    })
+
+
+generate_salaries(2000).to_csv(DATA_PATH, index=False)
@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+
+from src.aggregates import (
+    DIMENSION_LABELS,
+    SKETCH_ACCURACY,
+    build_country_series,
+    build_grid,
+    build_prefix_sums,
+    build_salary_cube,
+    build_sankey_flows,
+    build_sketches,
+    lookup_country_salary_per_year,
+    lookup_salary_per_year,
+    merge_sketches,
+    range_sankey_links,
+    range_totals,
+    sketch_quantiles,
+    sketch_quantiles_by,
+)
+from src.dataset import read_salaries_csv
+from tests.conftest import DATA_PATH
+
+
+def _salaries():
+    return read_salaries_csv(DATA_PATH)
+
+
+def _average_per_year(df: pd.DataFrame, **selection):
+    mask = np.ones(len(df), dtype=bool)
+    for column, values in selection.items():
+        if values:
+            mask &= df[column].isin(values).to_numpy()
+
+    expected = df[mask].groupby("work_year")["salary_in_usd"].mean()
+    return pd.DataFrame({"work_year": expected.index.to_numpy(), "salary_in_usd": expected.to_numpy()})
+
+
+def test_salary_cube_matches_groupby():
+    df = _salaries()
+    cube = build_salary_cube(build_grid(df))
+
+    for selection in [
+        {},
+        {"experience_level": ["SE"]},
+        {"experience_level": ["SE", "EX"], "company_size": ["L"]},
+        {"experience_level": ["MI"], "employment_type": ["FT", "CT"], "company_size": ["S", "M"]},
+    ]:
+        result = lookup_salary_per_year(cube, **selection)
+        expected = _average_per_year(df, **selection)
+        np.testing.assert_array_equal(result["work_year"], expected["work_year"])
+        np.testing.assert_allclose(result["salary_in_usd"], expected["salary_in_usd"])
+
+    assert lookup_salary_per_year(cube, company_size=["XL"]).empty
+
+
+def _exact_quantiles(salaries: np.ndarray, quantiles: list):
+    # the sketches answer the salary at the rank q * (n - 1) rounded down
+    salaries = np.sort(salaries)
+    return [salaries[int(q * (len(salaries) - 1))] for q in quantiles]
+
+
+def test_sketch_quantiles_within_accuracy():
+    df = _salaries()
+    sketches = build_sketches(df)
+    quantiles = [0.1, 0.5, 0.9, 0.99]
+
+    estimated = sketch_quantiles(sketches, quantiles)
+    np.testing.assert_allclose(estimated, _exact_quantiles(df["salary_in_usd"].to_numpy(), quantiles), rtol=SKETCH_ACCURACY)
+
+    selected = df[df["company_location"].isin(["US", "DE"]) & (df["experience_level"] == "SE")]
+    estimated = sketch_quantiles(sketches, quantiles, company_location=["US", "DE"], experience_level="SE")
+    np.testing.assert_allclose(estimated, _exact_quantiles(selected["salary_in_usd"].to_numpy(), quantiles), rtol=SKETCH_ACCURACY)
+
+    for code, estimated in sketch_quantiles_by(sketches, quantiles, by="company_location").items():
+        salaries = df.loc[df["company_location"] == code, "salary_in_usd"].to_numpy()
+        np.testing.assert_allclose(estimated, _exact_quantiles(salaries, quantiles), rtol=SKETCH_ACCURACY)
+
+    assert sketch_quantiles(sketches, quantiles, company_location="ZZ") == [None] * len(quantiles)
+
+
+def test_merged_sketches_match_combined_rows():
+    df = _salaries()
+    parts = [df.iloc[:700], df.iloc[700:1500], df.iloc[1500:]]
+
+    merged = merge_sketches(*(build_sketches(part) for part in parts))
+    pd.testing.assert_frame_equal(merged, build_sketches(df).sort_index())
+
+
+def test_country_series_matches_groupby():
+    df = _salaries()
+    series = build_country_series(build_grid(df))
+
+    for locations in [["US"], ["US", "GB", "JP"], ["PL", "ZZ"]]:
+        result = lookup_country_salary_per_year(series, locations)
+        expected = _average_per_year(df, company_location=locations)
+        np.testing.assert_array_equal(result["work_year"], expected["work_year"])
+        np.testing.assert_allclose(result["salary_in_usd"], expected["salary_in_usd"])
+
+    assert lookup_country_salary_per_year(series, ["ZZ"]).empty
+
+
+def test_range_totals_match_sums():
+    df = _salaries()
+    prefix = build_prefix_sums(build_grid(df), ["company_location"])
+
+    for start, end in [(2020, 2024), (2021, 2023), (2022, 2022), (2025, 2026)]:
+        sums, counts = range_totals(prefix, [start, end])
+        selected = df[df["work_year"].between(start, end)].groupby("company_location", observed=True)["salary_in_usd"]
+        expected = pd.DataFrame({"sum": selected.sum(), "count": selected.count()}).reindex(prefix["cells"], fill_value=0)
+
+        np.testing.assert_array_equal(sums, expected["sum"])
+        np.testing.assert_array_equal(counts, expected["count"])
+
+
+def _links(links: dict):
+    labels = links["labels"]
+    return {
+        (labels[source], labels[target]): value
+        for source, target, value in zip(links["source"], links["target"], links["value"])
+    }
+
+
+def _flows(df: pd.DataFrame, source: str, target: str):
+    counts = df.groupby([source, target], observed=True).size()
+    source_labels, target_labels = DIMENSION_LABELS.get(source, {}), DIMENSION_LABELS.get(target, {})
+    return {
+        (source_labels.get(source_value, str(source_value)), target_labels.get(target_value, str(target_value))): count
+        for (source_value, target_value), count in counts.items()
+        if count
+    }
+
+
+def test_range_sankey_links_match_counts():
+    df = _salaries()
+    flows = build_sankey_flows(build_grid(df), "company_size", "experience_level")
+
+    for start, end in [(2020, 2024), (2021, 2023), (2024, 2024)]:
+        links = range_sankey_links(flows, [start, end])
+        assert _links(links) == _flows(df[df["work_year"].between(start, end)], "company_size", "experience_level")
+
+    assert not len(range_sankey_links(flows, [2025, 2026])["value"])
+
+
+def test_range_sankey_links_of_other_columns():
+    df = _salaries()
+    flows = build_sankey_flows(build_grid(df), "employment_type", "remote_ratio")
+
+    links = range_sankey_links(flows, [2021, 2024])
+    assert _links(links) == _flows(df[df["work_year"].between(2021, 2024)], "employment_type", "remote_ratio")
+    assert {"Onsite", "Hybrid", "Remote"} <= set(links["labels"])
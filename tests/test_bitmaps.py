@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+from src.bitmaps import BitmapIndex, ScanIndex, salary_per_year
+from src.dataset import load_dataset
+from tests.conftest import DATA_PATH
+
+COLUMNS = ["experience_level", "employment_type", "company_size", "job_title", "company_location"]
+
+SELECTION = {
+    "experience_level": ["SE", "EX"],
+    "employment_type": [],
+    "company_size": ["L"],
+    "job_title": ["Data Scientist", "ML Engineer", "Unknown Title"],
+    "company_location": ["US", "DE"],
+}
+
+
+def _expected(partitions: dict, work_years=None):
+    df = pd.concat([df for year, df in partitions.items() if not work_years or work_years[0] <= year <= work_years[1]])
+    mask = np.ones(len(df), dtype=bool)
+    for column, values in SELECTION.items():
+        if values:
+            mask &= df[column].isin(values).to_numpy()
+
+    expected = df[mask].groupby("work_year")["salary_in_usd"].mean().reset_index()
+    return expected.astype({"work_year": "int64", "salary_in_usd": "float64"})
+
+
+def test_bitmap_index_matches_masks():
+    partitions = load_dataset(DATA_PATH, use_snapshot=False).partitions
+    indexes = {year: BitmapIndex(df, COLUMNS) for year, df in partitions.items()}
+
+    for work_years in [None, [2021, 2023], [2024, 2024]]:
+        result = salary_per_year(indexes, SELECTION, work_years)
+        pd.testing.assert_frame_equal(result, _expected(partitions, work_years))
+
+    assert salary_per_year(indexes, {"company_location": ["ZZ"]}).empty
+
+
+def test_scan_index_matches_masks():
+    partitions = load_dataset(DATA_PATH, use_snapshot=False).partitions
+    indexes = {year: ScanIndex(df, COLUMNS, chunk_size=37) for year, df in partitions.items()}
+
+    for work_years in [None, [2021, 2023]]:
+        result = salary_per_year(indexes, SELECTION, work_years)
+        pd.testing.assert_frame_equal(result, _expected(partitions, work_years))
+
+
+def test_scan_index_matches_bitmap_index():
+    partitions = load_dataset(DATA_PATH, use_snapshot=False).partitions
+    scans = {year: ScanIndex(df, COLUMNS, chunk_size=100) for year, df in partitions.items()}
+    bitmaps = {year: BitmapIndex(df, COLUMNS) for year, df in partitions.items()}
+
+    pd.testing.assert_frame_equal(salary_per_year(scans, SELECTION), salary_per_year(bitmaps, SELECTION))
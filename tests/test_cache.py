@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+from src.cache import DiskBackend, FigureCache, MemoryBackend, SingleFlight
+
+
+def test_memoize_reads_dataset_once_per_call():
+    versions = iter(["first", "second", "third"])
+    cache = FigureCache(MemoryBackend(), dataset=lambda: SimpleNamespace(version=next(versions)))
+
+    def build(value, dataset=None):
+        return {"value": value, "version": dataset.version}
+
+    figure = cache.memoize(build)
+
+    # the figure is computed from the same dataset as the key it is cached under
+    assert figure(1) == {"value": 1, "version": "first"}
+    assert cache.backend.get(cache.make_key(f"{__name__}.{build.__qualname__}", "first", (1,), {})) is not None
+    assert figure(1) == {"value": 1, "version": "second"}
+
+
+def test_memory_backend_evicts_least_recently_used_by_count():
+    backend = MemoryBackend(max_entries=2)
+    backend.set("a", b"1")
+    backend.set("b", b"2")
+    backend.get("a")
+    backend.set("c", b"3")
+
+    assert backend.get("b") is None
+    assert backend.get("a") == b"1"
+    assert backend.get("c") == b"3"
+
+
+def test_memory_backend_evicts_least_recently_used_by_size():
+    backend = MemoryBackend(max_bytes=10)
+    backend.set("a", b"x" * 4)
+    backend.set("b", b"x" * 4)
+    backend.get("a")
+    backend.set("c", b"x" * 4)
+
+    assert backend.get("b") is None
+    assert backend.get("a") is not None and backend.get("c") is not None
+
+    # a value larger than the limit is not kept at all
+    backend.set("d", b"x" * 11)
+    assert backend.get("d") is None
+
+
+def test_disk_backend_evicts_least_recently_used(tmp_path):
+    backend = DiskBackend(str(tmp_path), max_entries=2, max_bytes=10)
+    backend.set("a", b"x" * 4)
+    backend.set("b", b"x" * 4)
+    os.utime(tmp_path / "a.json", ns=(1, 1))
+    os.utime(tmp_path / "b.json", ns=(2, 2))
+    backend.set("c", b"x" * 4)
+
+    assert backend.get("a") is None
+    assert backend.get("b") is not None and backend.get("c") is not None
+
+    os.utime(tmp_path / "b.json", ns=(3, 3))
+    backend.set("d", b"x")
+    assert sorted(os.listdir(tmp_path)) == ["c.json", "d.json"]
+
+
+def test_single_flight_runs_identical_calls_once():
+    flights = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(10)
+        return "figure"
+
+    def call():
+        results.append(flights.do("key", compute))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(10)
+    followers = [threading.Thread(target=call) for _ in range(4)]
+    for follower in followers:
+        follower.start()
+
+    # the followers join the flight of the leader, which finishes only once released
+    time.sleep(0.2)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(10)
+
+    assert len(calls) == 1
+    assert sorted(results) == [("figure", False)] + [("figure", True)] * 4
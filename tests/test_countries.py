@@ -0,0 +1,29 @@
+import shutil
+import sys
+
+from src.countries import resolve_countries
+from src.dataset import load_dataset
+from tests.conftest import DATA_PATH
+
+
+def test_unknown_code():
+    countries = resolve_countries(["US", "ZZ"])
+
+    assert countries.at["US", "iso3"] == "USA"
+    assert countries.at["ZZ", "iso3"] is None
+    assert countries.at["ZZ", "official_name"] is None
+
+
+def test_page_data_with_unknown_code(tmp_path):
+    from src.main import app  # noqa: F401 (the pages are imported by the app)
+
+    path = str(tmp_path / "salaries.csv")
+    shutil.copy(DATA_PATH, path)
+    with open(path, "a") as f:
+        # the lowest salary, so the unknown code is shown in the cards
+        f.write("2024,SE,FT,Data Scientist,1,USD,1,ZZ,0,ZZ,M\n")
+
+    data = sys.modules["pages.salaries"].prepare_page_data(load_dataset(path))
+
+    assert data["min_salary_location_fullname"] == "ZZ"
+    assert "ZZ" not in data["choropleth_df"]["company_location"].tolist()
@@ -0,0 +1,72 @@
+import os
+import shutil
+import sys
+import threading
+
+import pandas as pd
+
+import src.dataset
+from src.dataset import _apply_changes, _cache_path, current, load_dataset, load_partitions, read_salaries_csv, stream_dataset
+from src.snapshot import split_partitions
+from tests.conftest import DATA_PATH, generate_salaries
+
+
+def test_nested_derive():
+    values = []
+
+    # a deadlock would block the test forever, the derive runs in a thread with a timeout
+    thread = threading.Thread(
+        target=lambda: values.append(
+            current().derive("test outer", lambda outer: outer.derive("test inner", lambda inner: 1) + 1)
+        ),
+        daemon=True,
+    )
+    thread.start()
+    thread.join(10)
+
+    assert values == [2]
+    assert current().derive("test inner", lambda inner: 0) == 1
+
+
+def test_append_reuses_unchanged_partitions(tmp_path):
+    from src.main import app  # noqa: F401 (the pages are imported by the app)
+
+    salaries = sys.modules["pages.salaries"]
+    path = str(tmp_path / "salaries.csv")
+    shutil.copy(DATA_PATH, path)
+    previous = load_dataset(path, use_snapshot=False)
+    page_data = salaries.prepare_page_data(previous)
+    inodes = {year: os.stat(os.path.join(_cache_path(previous.version), f"{year}.parquet")).st_ino for year in previous.partitions}
+
+    with open(path) as f:
+        last_row = f.readlines()[-1]
+    with open(path, "a") as f:
+        f.write("2025" + last_row[last_row.index(","):])
+    dataset = _apply_changes(previous, path)
+    new_page_data = salaries.prepare_page_data(dataset)
+
+    assert list(dataset.partitions) == list(previous.partitions) + [2025]
+    for year in previous.partitions:
+        assert dataset.partitions[year] is previous.partitions[year]
+        assert new_page_data["bitmap_indexes"][year] is page_data["bitmap_indexes"][year]
+        # the cache files of the unchanged years are linked, not written again
+        assert os.stat(os.path.join(_cache_path(dataset.version), f"{year}.parquet")).st_ino == inodes[year]
+    assert len(load_partitions(path, dataset.version)[2025]) == 1
+
+
+def test_streamed_append_in_chunks(tmp_path, monkeypatch):
+    path = str(tmp_path / "salaries.csv")
+    directory = str(tmp_path / "snapshot")
+    shutil.copy(DATA_PATH, path)
+    monkeypatch.setattr(src.dataset, "CHUNK_SIZE", 300)
+    monkeypatch.setattr(src.dataset, "SNAPSHOT_DIR", directory)
+    previous = stream_dataset(path, directory, 300)
+
+    generate_salaries(700, seed=1).to_csv(path, mode="a", header=False, index=False)
+    dataset = _apply_changes(previous, path)
+
+    expected = split_partitions(read_salaries_csv(path))
+    assert list(dataset.partitions) == list(expected)
+    for year, df in expected.items():
+        pd.testing.assert_frame_equal(dataset.partitions[year].astype(str), df.astype(str))
+    assert dataset.grid["count"].sum() == sum(len(df) for df in expected.values())
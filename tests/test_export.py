@@ -0,0 +1,27 @@
+import io
+
+import pandas as pd
+
+from src.export import _iter_csv, _iter_parquet
+
+TITLES = [f"Title {i}" for i in range(200)]
+
+PARTITIONS = [
+    pd.DataFrame({"job_title": pd.Categorical(["Title 0"]), "salary_in_usd": [100]}),
+    # more categories than the first partition, so the codes are wider
+    pd.DataFrame({"job_title": pd.Categorical(TITLES), "salary_in_usd": range(200)}),
+]
+
+
+def test_csv_header_without_rows():
+    data = b"".join(_iter_csv([PARTITIONS[0].iloc[:0]], {}))
+
+    assert data == b"job_title,salary_in_usd\n"
+
+
+def test_parquet_partitions_with_different_categories():
+    data = b"".join(_iter_parquet(PARTITIONS, {}))
+
+    df = pd.read_parquet(io.BytesIO(data))
+    assert df["job_title"].astype(str).tolist() == ["Title 0"] + TITLES
+    assert df["salary_in_usd"].tolist() == [100] + list(range(200))
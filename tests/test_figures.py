@@ -0,0 +1,35 @@
+import sys
+
+import pandas as pd
+
+from src.aggregates import build_grid, build_sankey_flows, range_sankey_links
+from src.dataset import read_salaries_csv
+from src.figures import salary_figure, sankey_figure
+from tests.conftest import DATA_PATH
+
+
+def test_salary_title_follows_years():
+    average_salary_per_year = pd.DataFrame({"work_year": [2021, 2022], "salary_in_usd": [1.0, 2.0]})
+
+    assert "from 2021 to 2022" in salary_figure(average_salary_per_year, [2021, 2022])["layout"]["title"]["text"]
+    assert "in 2023 " in salary_figure(average_salary_per_year.iloc[:0], [2023, 2023])["layout"]["title"]["text"]
+
+
+def test_salary_graph_title_of_selected_years():
+    from src.main import app  # noqa: F401 (the pages are imported by the app)
+
+    update_graph = sys.modules["pages.salaries"].update_graph
+
+    assert "from 2021 to 2023" in update_graph([], [], [], [], [], [2021, 2023])["layout"]["title"]["text"]
+    assert "from 2020 to 2024" in update_graph([], [], [], [], [], None)["layout"]["title"]["text"]
+
+
+def test_sankey_node_colors_are_distinct():
+    grid = build_grid(read_salaries_csv(DATA_PATH))
+
+    # more nodes than the colors of the scale, e.g. 10 countries and 4 experience levels
+    for source, target in [("company_size", "experience_level"), ("company_location", "experience_level")]:
+        links = range_sankey_links(build_sankey_flows(grid, source, target), [2020, 2024])
+        node = sankey_figure(links, "")["data"][0]["node"]
+
+        assert len(node["color"]) == len(node["label"]) == len(set(node["color"]))
@@ -0,0 +1,82 @@
+import sys
+import threading
+
+from src import dataset
+
+
+def _get_in_thread(client, url: str, timeout: float = 60):
+    responses = []
+    thread = threading.Thread(target=lambda: responses.append(client.get(url)), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), f"GET {url} did not finish"
+    return responses[0]
+
+
+def test_static_figure_as_first_request():
+    from src.main import app
+
+    for name in ("choropleth", "remote-ratio"):
+        # a cold worker, the page data are derived while the payload is being built
+        dataset._current = None
+        response = _get_in_thread(app.server.test_client(), f"/_figures/{name}")
+
+        assert response.status_code == 200
+        assert response.get_json()["data"]
+
+
+def _update(client, graph: str, values: dict, changed: str):
+    """Calls the server callback patching the figure of a static graph, returns whether it was patched."""
+    dependency = next(
+        dependency for dependency in client.get("/_dash-dependencies").get_json()
+        if dependency["output"].startswith(f"{graph}.figure@") and dependency["clientside_function"] is None
+    )
+    response = client.post("/_dash-update-component", json={
+        "output": dependency["output"],
+        "outputs": {"id": graph, "property": dependency["output"].split(".", 1)[1]},
+        "inputs": [dict(input, value=values.get(f"{input['id']}.{input['property']}")) for input in dependency["inputs"]],
+        "state": [],
+        "changedPropIds": [changed],
+    })
+    # dash answers 204 or an empty response when the callback returns no_update
+    return response.status_code == 200 and graph in response.get_json()["response"]
+
+
+def test_static_figure_patched_after_fetch():
+    from src.main import app
+
+    client = app.server.test_client()
+    years = dataset.current().derive("pages.job-market", sys.modules["pages.job-market"].prepare_page_data)["work_years"]
+    all_years = [years[0], years[-1]]
+
+    # the default state is already part of the fetched figure
+    assert not _update(client, "remote-ratio-graph", {
+        "remote-ratio-items.value": ["Onsite"],
+        "work-years-slider.value": all_years,
+        "remote-ratio-graph-loaded.data": 1,
+    }, "remote-ratio-graph-loaded.data")
+
+    # the selection made before the figure arrived is applied to it again
+    assert _update(client, "remote-ratio-graph", {
+        "remote-ratio-items.value": ["Remote"],
+        "work-years-slider.value": [years[-1], years[-1]],
+        "remote-ratio-graph-loaded.data": 1,
+    }, "remote-ratio-graph-loaded.data")
+    assert _update(client, "choropleth-graph", {
+        "salary-years-slider.value": [years[-1], years[-1]],
+        "choropleth-graph-loaded.data": 1,
+    }, "choropleth-graph-loaded.data")
+
+
+def test_remote_ratio_axes_follow_selection():
+    from src.main import app  # noqa: F401 (the pages are imported by the app)
+
+    job_market = sys.modules["pages.job-market"]
+    counts = job_market.get_page_data()["remote_ratio_counts"]
+    years = list(counts.index)
+
+    patch = job_market.update_graph(["Remote"], [years[1], years[2]]).to_plotly_json()
+    patched = {tuple(operation["location"]): operation["params"]["value"] for operation in patch["operations"]}
+
+    assert patched[("layout", "xaxis", "range")] == [years[1] - 0.5, years[2] + 0.5]
+    assert patched[("layout", "yaxis", "range")][1] == counts.loc[years[1]:years[2], "Remote"].max() * 1.05
@@ -0,0 +1,61 @@
+import mmap
+import os
+
+from src.aggregates import build_grid, build_sketches
+from src.dataset import read_salaries_csv
+from src.snapshot import (
+    append_snapshot, read_snapshot, read_snapshot_version, split_partitions, stream_snapshot, write_snapshot
+)
+from tests.conftest import DATA_PATH
+
+
+def _is_memory_mapped(values):
+    while values is not None:
+        if isinstance(values, mmap.mmap):
+            return True
+        values = getattr(values, "base", None)
+    return False
+
+
+def _write(directory, df, version):
+    partitions = split_partitions(df)
+    write_snapshot(directory, partitions, build_grid(df), build_sketches(df), version, 0, b"")
+
+
+def test_commit_keeps_snapshots_of_other_processes(tmp_path):
+    df = read_salaries_csv(DATA_PATH)
+    _write(str(tmp_path), df, "first")
+    writing = tmp_path / "third.12345.tmp"
+    writing.mkdir()
+
+    _write(str(tmp_path), df, "second")
+
+    assert read_snapshot_version(str(tmp_path)) == "second"
+    assert writing.is_dir()
+    assert not (tmp_path / "first").exists()
+
+
+def test_append_already_done_by_another_process(tmp_path):
+    df = read_salaries_csv(DATA_PATH)
+    rows = df.iloc[-10:]
+    _write(str(tmp_path), df.iloc[:-10], "first")
+
+    assert append_snapshot(str(tmp_path), "first", [rows], "second", 0, b"", 1000)
+    mtime = os.path.getmtime(tmp_path / "second")
+    # a worker still holding the first version finds the rows already appended
+    assert append_snapshot(str(tmp_path), "first", [rows], "second", 0, b"", 1000)
+
+    assert os.path.getmtime(tmp_path / "second") == mtime
+    assert read_snapshot(str(tmp_path))["version"] == "second"
+    assert sum(len(part) for part in read_snapshot(str(tmp_path))["partitions"].values()) == len(df)
+
+
+def test_streamed_categories_are_memory_mapped(tmp_path):
+    df = read_salaries_csv(DATA_PATH)
+    stream_snapshot(str(tmp_path), [df.iloc[:1000], df.iloc[1000:]], "streamed", 0, b"")
+    partitions = read_snapshot(str(tmp_path))["partitions"]
+    assert append_snapshot(str(tmp_path), "streamed", [df.iloc[:10]], "appended", 0, b"", 100)
+
+    for snapshot in (partitions, read_snapshot(str(tmp_path))["partitions"]):
+        for part in snapshot.values():
+            assert _is_memory_mapped(part["job_title"].array.codes)